@@ -7,6 +7,7 @@ UI components for the application.
 from .auth_component import ensure_ee_initialized
 from .aoi_component import AOIComponent
 from .time_series import TimeSeriesComponent
+from .field_batch import FieldBatchComponent
 from .visitor_stats import VisitorStatsComponent
 from .contact_form import ContactFormComponent
 
@@ -14,6 +15,7 @@ __all__ = [
     'ensure_ee_initialized',
     'AOIComponent',
     'TimeSeriesComponent',
+    'FieldBatchComponent',
     'VisitorStatsComponent',
     'ContactFormComponent',
 ]
@@ -13,7 +13,18 @@ from folium.plugins import Draw
 from streamlit_folium import st_folium
 import ee
 import json
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.ee_bundle import evaluate_bundle
+from core.geometry_utils import geojson_bbox, geojson_centroid
+
+
+# Feature properties tried, in order, as the ID of an uploaded field
+FIELD_ID_PROPERTIES = ('field_id', 'name', 'Name', 'NAME', 'id', 'ID')
 
 
 class AOIComponent:
@@ -26,6 +37,8 @@ class AOIComponent:
         self.geometry_key = f"{session_prefix}aoi_geometry"
         self.confirmed_key = f"{session_prefix}aoi_confirmed"
         self.area_key = f"{session_prefix}aoi_area_km2"
+        self.fields_key = f"{session_prefix}aoi_fields"
+        self.info_key = f"{session_prefix}aoi_info"
     
     def render(self) -> Optional[ee.Geometry]:
         """
@@ -130,11 +143,18 @@ class AOIComponent:
                 geojson_data = json.loads(content)
                 
                 # Extract geometry
+                fields = None
                 if geojson_data.get('type') == 'FeatureCollection':
                     features = geojson_data.get('features', [])
                     if features:
                         geometry_dict = features[0].get('geometry')
                         st.success(f"✅ Found {len(features)} feature(s)")
+                        if len(features) > 1:
+                            fields = self._extract_fields(features)
+                            st.caption(
+                                f"🌾 All {len(fields)} fields are kept for multi-field batch analysis; "
+                                "the first one is used as the map area."
+                            )
                     else:
                         st.error("No features found in file")
                         return None
@@ -146,7 +166,7 @@ class AOIComponent:
                     st.success("✅ Geometry loaded")
                 
                 if st.button("✅ Use This Area", type="primary", key=f"{self.prefix}confirm_upload"):
-                    return self._confirm_geometry(geometry_dict)
+                    return self._confirm_geometry(geometry_dict, fields)
                     
             except json.JSONDecodeError:
                 st.error("❌ Invalid JSON file")
@@ -200,25 +220,88 @@ class AOIComponent:
         
         return None
     
-    def _confirm_geometry(self, geometry_dict: Dict) -> Optional[ee.Geometry]:
+    def _extract_fields(self, features: List[Dict]) -> List[Dict]:
+        """
+        Turn uploaded features into field dicts with an ID and GeoJSON geometry.
+        
+        IDs come from the first name/id property, or the feature number. A
+        repeated ID gets the feature number appended, so results of fields
+        sharing a name are never merged.
+        """
+        fields, seen = [], set()
+        for i, feature in enumerate(features):
+            geometry = feature.get('geometry')
+            if not geometry:
+                continue
+            props = feature.get('properties') or {}
+            field_id = str(next(
+                (props[k] for k in FIELD_ID_PROPERTIES if props.get(k) not in (None, "")),
+                f"field_{i + 1}"
+            ))
+            if field_id in seen:
+                base, n = field_id, i + 1
+                field_id = f"{base} ({n})"
+                while field_id in seen:
+                    n += 1
+                    field_id = f"{base} ({n})"
+            seen.add(field_id)
+            fields.append({'field_id': field_id, 'geometry': geometry})
+        return fields
+    
+    def get_fields(self) -> Optional[List[Dict]]:
+        """Return the confirmed multi-field upload, if any."""
+        if not st.session_state.get(self.confirmed_key, False):
+            return None
+        return st.session_state.get(self.fields_key)
+    
+    def get_aoi_info(self) -> Optional[Dict]:
+        """
+        Return client-side details of the confirmed AOI.
+        
+        Returns:
+            Dict with 'geojson', 'bbox' (min_lon, min_lat, max_lon, max_lat)
+            and 'centroid' (lon, lat), or None if no AOI is confirmed.
+        """
+        if not st.session_state.get(self.confirmed_key, False):
+            return None
+        return st.session_state.get(self.info_key)
+    
+    def _confirm_geometry(self, geometry_dict: Dict, fields: List[Dict] = None) -> Optional[ee.Geometry]:
         """Convert geometry dict to EE geometry and store."""
         try:
             geometry = ee.Geometry(geometry_dict)
-            return self._store_and_confirm(geometry)
+            return self._store_and_confirm(geometry, fields)
         except Exception as e:
             st.error(f"❌ Error creating geometry: {str(e)}")
             return None
     
-    def _store_and_confirm(self, geometry: ee.Geometry) -> ee.Geometry:
-        """Store geometry in session state and confirm."""
+    def _store_and_confirm(self, geometry: ee.Geometry, fields: List[Dict] = None) -> ee.Geometry:
+        """Store geometry (and any uploaded fields) in session state and confirm."""
         try:
-            # Calculate area
-            area_km2 = geometry.area().divide(1e6).getInfo()
+            # Drawn, uploaded and rectangle AOIs already have their GeoJSON
+            # client-side; computed ones (buffers) are fetched with the area
+            try:
+                geojson = geometry.toGeoJSON()
+            except Exception:
+                geojson = None
+            
+            required = {'area_km2': geometry.area().divide(1e6)}
+            if geojson is None:
+                required['geojson'] = geometry
+            values = evaluate_bundle(required)
+            area_km2 = values['area_km2']
+            geojson = geojson or values['geojson']
             
             # Store in session state
             st.session_state[self.geometry_key] = geometry
             st.session_state[self.confirmed_key] = True
             st.session_state[self.area_key] = area_km2
+            st.session_state[self.fields_key] = fields
+            st.session_state[self.info_key] = {
+                'geojson': geojson,
+                'bbox': geojson_bbox(geojson),
+                'centroid': geojson_centroid(geojson),
+            }
             
             st.success(f"✅ Area confirmed: {area_km2:.2f} km²")
             st.rerun()
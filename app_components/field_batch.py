@@ -0,0 +1,178 @@
+"""
+AgriVision Pro V3 - Multi-Field Batch Component
+================================================
+Per-field index time series for many uploaded field polygons at once.
+"""
+
+import streamlit as st
+import pandas as pd
+import numpy as np
+from typing import List, Dict
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.satellite_data import get_scale_for_sensor
+from core.vegetation_indices import get_available_indices
+from core.extraction import extract_field_index_means, chunk_image_ids
+from core.ee_executor import get_executor
+from core.trends import linear_trend_slopes
+
+
+# Each batch reduces up to 5000 field/image pairs, so allow more than a single call
+FIELD_BATCH_TIMEOUT_SECONDS = 300
+
+
+class FieldBatchComponent:
+    """Component for batch time series over a collection of fields."""
+
+    def __init__(self, session_prefix: str = ""):
+        """Initialize multi-field batch component."""
+        self.prefix = session_prefix
+
+    def render(
+        self,
+        fields: List[Dict],
+        images: List[Dict],
+        sensor: str,
+        index_name: str
+    ) -> bool:
+        """
+        Render multi-field batch analysis.
+
+        Args:
+            fields: Field dicts with 'field_id' and GeoJSON 'geometry'
+            images: List of image info dicts covering the fields
+            sensor: Sensor name
+            index_name: Default vegetation index
+
+        Returns:
+            True if analysis successful
+        """
+        st.subheader("🌾 Multi-Field Batch Analysis")
+
+        if not images or len(images) < 2:
+            st.info("Need at least 2 images for multi-field analysis.")
+            return False
+
+        st.info(f"{len(fields)} fields × {len(images)} available images")
+
+        index_names = st.multiselect(
+            "Indices:",
+            list(get_available_indices(sensor).keys()),
+            default=[index_name],
+            key=f"{self.prefix}fields_indices"
+        ) or [index_name]
+
+        max_images = st.slider(
+            "Number of images to analyze:",
+            2, len(images), min(30, len(images)),
+            key=f"{self.prefix}fields_limit"
+        )
+
+        if st.button("🌾 Run Batch Analysis", type="primary", key=f"{self.prefix}fields_run"):
+            return self._run_batch(fields, images[:max_images], sensor, index_names)
+
+        return False
+
+    def _run_batch(
+        self,
+        fields: List[Dict],
+        images: List[Dict],
+        sensor: str,
+        index_names: List[str]
+    ) -> bool:
+        """Reduce every image over every field and show per-field trends."""
+        progress = st.progress(0, text="Reducing fields...")
+
+        try:
+            scale = get_scale_for_sensor(sensor)
+            chunks = chunk_image_ids([img['id'] for img in images], len(fields))
+
+            rows, failed = [], 0
+            results = get_executor().map_unordered(
+                lambda i: extract_field_index_means(sensor, chunks[i], fields, index_names, scale),
+                range(len(chunks)),
+                timeout=FIELD_BATCH_TIMEOUT_SECONDS
+            )
+            for done, result in enumerate(results, start=1):
+                progress.progress(done / len(chunks), text=f"Processed batch {done}/{len(chunks)}...")
+                if result.ok:
+                    rows.extend(result.value)
+                else:
+                    failed += 1
+
+            progress.empty()
+
+            if failed:
+                st.warning(f"⚠️ {failed} of {len(chunks)} batches failed; results are partial.")
+
+            df = self._to_tidy_frame(rows, images, index_names)
+            if df.empty:
+                st.warning("⚠️ Could not calculate field values.")
+                return False
+
+            trends = self._field_trends(df)
+
+            st.markdown("**📈 Trend per field (change per year):**")
+            st.dataframe(trends, use_container_width=True)
+
+            with st.expander("📋 View Data Table"):
+                st.dataframe(df, use_container_width=True)
+
+            col1, col2 = st.columns(2)
+            with col1:
+                st.download_button(
+                    "📥 Download Field Data CSV",
+                    df.to_csv(index=False),
+                    "field_timeseries.csv",
+                    "text/csv",
+                    key=f"{self.prefix}fields_download_csv"
+                )
+            with col2:
+                st.download_button(
+                    "📥 Download Trends CSV",
+                    trends.to_csv(),
+                    "field_trends.csv",
+                    "text/csv",
+                    key=f"{self.prefix}fields_download_trends"
+                )
+
+            return True
+
+        except Exception as e:
+            progress.empty()
+            st.error(f"❌ Error: {str(e)}")
+            return False
+
+    @staticmethod
+    def _to_tidy_frame(rows: List[Dict], images: List[Dict], index_names: List[str]) -> pd.DataFrame:
+        """Convert reduction rows to a long field × date × index table."""
+        if not rows:
+            return pd.DataFrame(columns=['field_id', 'date', 'index', 'value'])
+
+        dates = {img['id']: img['date'] for img in images}
+        wide = pd.DataFrame(rows)
+        wide['date'] = pd.to_datetime(wide['image_id'].map(dates))
+
+        tidy = wide.melt(
+            id_vars=['field_id', 'date'], value_vars=index_names,
+            var_name='index', value_name='value'
+        ).dropna(subset=['value'])
+        tidy['value'] = tidy['value'].astype(float)
+        return tidy.sort_values(['field_id', 'index', 'date']).reset_index(drop=True)
+
+    @staticmethod
+    def _field_trends(df: pd.DataFrame) -> pd.DataFrame:
+        """Fit a linear trend to every field and index in one vectorized pass."""
+        trends = {}
+        for index_name, group in df.groupby('index'):
+            # Fields × dates matrix; same-day scenes are averaged
+            matrix = group.pivot_table(index='field_id', columns='date', values='value', aggfunc='mean')
+            days = (matrix.columns - matrix.columns.min()).days.values
+            slopes = linear_trend_slopes(matrix.values, days) * 365.25
+            trends[f"{index_name} slope/yr"] = pd.Series(slopes, index=matrix.index)
+            trends[f"{index_name} mean"] = pd.Series(np.nanmean(matrix.values, axis=1), index=matrix.index)
+
+        return pd.DataFrame(trends).round(4)
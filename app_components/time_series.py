@@ -9,15 +9,20 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import ee
-from typing import List, Dict
+from datetime import datetime
+from typing import List, Dict, Optional
 import numpy as np
 
 import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from core.satellite_data import get_single_image, get_scale_for_sensor
-from core.vegetation_indices import calculate_index
+from core.satellite_data import get_single_image, get_scale_for_sensor, get_image_list
+from core.vegetation_indices import calculate_indices, get_available_indices
+from core.extraction import extract_multi_index_means, is_timeout_error
+from core.ee_executor import get_executor
+from core.geometry_utils import geometry_fingerprint
+from core.stats_cache import get_stats_cache, make_stat_key, make_series_key
 
 
 class TimeSeriesComponent:
@@ -32,7 +37,10 @@ class TimeSeriesComponent:
         aoi: ee.Geometry,
         images: List[Dict],
         sensor: str,
-        index_name: str
+        index_name: str,
+        end_date: str = None,
+        max_cloud: int = 100,
+        start_date: str = None
     ) -> bool:
         """
         Render time series analysis.
@@ -42,6 +50,9 @@ class TimeSeriesComponent:
             images: List of image info dicts
             sensor: Sensor name
             index_name: Vegetation index to analyze
+            end_date: End of the analysis window, used by incremental refresh
+            max_cloud: Cloud threshold the image list was queried with
+            start_date: Start of the analysis window, used by incremental refresh
         
         Returns:
             True if analysis successful
@@ -54,6 +65,15 @@ class TimeSeriesComponent:
         
         st.info(f"Analyzing {len(images)} images for {index_name} trends")
         
+        incremental = st.checkbox(
+            "🔁 Incremental refresh (only fetch scenes missing from the stored series)",
+            key=f"{self.prefix}ts_incremental"
+        )
+        if incremental:
+            start_date = start_date or min(img['date'] for img in images)
+            return self._render_incremental(aoi, images, sensor, index_name,
+                                            start_date, end_date, max_cloud)
+        
         # Image limit slider
         max_images = st.slider(
             "Number of images to analyze:",
@@ -61,8 +81,16 @@ class TimeSeriesComponent:
             key=f"{self.prefix}ts_limit"
         )
         
+        # Extra indices are computed in the same pass as the selected one
+        index_names = st.multiselect(
+            "Indices to plot:",
+            list(get_available_indices(sensor).keys()),
+            default=[index_name],
+            key=f"{self.prefix}ts_indices"
+        ) or [index_name]
+        
         if st.button("📊 Generate Time Series", type="primary", key=f"{self.prefix}gen_ts"):
-            return self._generate_time_series(aoi, images[:max_images], sensor, index_name)
+            return self._generate_time_series(aoi, images[:max_images], sensor, index_names)
         
         return False
     
@@ -71,112 +99,312 @@ class TimeSeriesComponent:
         aoi: ee.Geometry,
         images: List[Dict],
         sensor: str,
-        index_name: str
+        index_names: List[str]
     ) -> bool:
-        """Generate time series chart."""
+        """Generate time series chart for one or more indices."""
         progress = st.progress(0, text="Calculating time series...")
         
         try:
-            dates = []
-            values = []
             scale = get_scale_for_sensor(sensor)
+            means = self._get_image_means(aoi, images, sensor, index_names, scale, progress)
             
-            for i, img_info in enumerate(images):
-                progress.progress((i + 1) / len(images), text=f"Processing image {i+1}/{len(images)}...")
-                
-                try:
-                    img = get_single_image(sensor, img_info['id'], aoi)
-                    if img is None:
-                        continue
-                    
-                    idx_img = calculate_index(img, index_name, sensor)
-                    band_name = idx_img.bandNames().getInfo()[0]
-                    
-                    # Calculate mean over AOI with bestEffort=True
-                    mean_val = idx_img.reduceRegion(
-                        reducer=ee.Reducer.mean(),
-                        geometry=aoi,
-                        scale=scale,
-                        maxPixels=1e9,
-                        bestEffort=True
-                    ).getInfo()
-                    
-                    val = mean_val.get(band_name) or mean_val.get(index_name)
-                    
-                    if val is not None:
-                        dates.append(img_info['date'])
-                        values.append(val)
-                        
-                except Exception:
-                    continue
+            rows = []
+            for img_info in images:
+                values = means.get(img_info['id'], {})
+                if any(values.get(name) is not None for name in index_names):
+                    rows.append({'Date': img_info['date'],
+                                 **{name: values.get(name) for name in index_names}})
             
             progress.empty()
             
-            if not dates or not values:
+            failed = len(images) - len(means)
+            if failed:
+                st.caption(f"⚠️ {failed} image(s) could not be computed and are left out")
+            
+            if not rows:
                 st.warning("⚠️ Could not calculate time series values.")
                 return False
             
-            # Create DataFrame
-            df = pd.DataFrame({
-                'Date': pd.to_datetime(dates),
-                index_name: values
-            }).sort_values('Date')
+            df = pd.DataFrame(rows)
+            df['Date'] = pd.to_datetime(df['Date'])
+            df[index_names] = df[index_names].astype(float)
+            df = df.sort_values('Date')
             
-            # Create chart
-            fig = px.line(
-                df, x='Date', y=index_name,
-                markers=True,
-                title=f"{index_name} Time Series"
-            )
-            
-            fig.update_layout(
-                xaxis_title="Date",
-                yaxis_title=index_name,
-                hovermode='x unified',
-                template='plotly_white'
-            )
-            
-            # Add trend line
-            if len(df) >= 3:
-                try:
-                    z = pd.to_numeric(df['Date']).values
-                    coeffs = np.polyfit(z, df[index_name].values, 1)
-                    trend_y = coeffs[0] * z + coeffs[1]
-                    fig.add_trace(go.Scatter(
-                        x=df['Date'], y=trend_y,
-                        mode='lines',
-                        name='Trend',
-                        line=dict(dash='dash', color='red')
-                    ))
-                except Exception:
-                    pass
+            self._render_results(df, index_names)
             
-            st.plotly_chart(fig, use_container_width=True)
+            return True
             
-            # Statistics
-            self._show_statistics(df, index_name)
+        except Exception as e:
+            progress.empty()
+            st.error(f"❌ Error: {str(e)}")
+            return False
+    
+    def _render_incremental(
+        self,
+        aoi: ee.Geometry,
+        images: List[Dict],
+        sensor: str,
+        index_name: str,
+        start_date: str,
+        end_date: Optional[str],
+        max_cloud: int
+    ) -> bool:
+        """
+        Refresh a stored series with only the scenes it doesn't have yet.
+        
+        The first run seeds the series from every listed image. Later runs
+        also query acquisitions since the last stored date, compute every
+        listed scene missing from the series (new ones, and ones that
+        failed before), append them, and redraw the trend and statistics
+        for the current window. Rolling or widened windows reuse the same
+        stored series.
+        """
+        scale = get_scale_for_sensor(sensor)
+        series_key = make_series_key(
+            sensor, index_name, geometry_fingerprint(aoi), scale, max_cloud
+        )
+        end = end_date or datetime.now().strftime('%Y-%m-%d')
+        
+        try:
+            cache = get_stats_cache()
+            stored = cache.get_series(series_key)
+        except Exception as e:
+            st.error(f"❌ Stored series unavailable: {str(e)}")
+            return False
+        
+        if stored:
+            st.caption(f"💾 Stored series: {len(stored)} scenes through {stored[-1]['date']}")
+        else:
+            st.caption("💾 No stored series yet. The first run computes all listed images.")
+        
+        if not st.button("🔁 Refresh Time Series", type="primary", key=f"{self.prefix}refresh_ts"):
+            return False
+        
+        progress = st.progress(0, text="Checking for new scenes...")
+        
+        try:
+            listed = {img['id']: img for img in images}
+            if stored:
+                # Query from the last stored date (inclusive) so late-ingested
+                # scenes from that day are picked up
+                newer = get_image_list(sensor, stored[-1]['date'], end, aoi, max_cloud)
+                listed.update((img['id'], img) for img in newer)
+            known_ids = {point['id'] for point in stored}
+            new_images = [img for img in listed.values() if img['id'] not in known_ids]
             
-            # Data table
-            with st.expander("📋 View Data Table"):
-                st.dataframe(df.set_index('Date'), use_container_width=True)
+            new_points = []
+            if new_images:
+                means = self._get_image_means(aoi, new_images, sensor, [index_name], scale, progress)
+                new_points = [
+                    {'id': img['id'], 'date': img['date'], 'value': means[img['id']][index_name]}
+                    for img in new_images if img['id'] in means
+                ]
+                cache.append_series(series_key, new_points)
+                stored = stored + new_points
             
-            # CSV download
-            csv = df.to_csv(index=False)
-            st.download_button(
-                "📥 Download CSV",
-                csv,
-                f"{index_name}_timeseries.csv",
-                "text/csv",
-                key=f"{self.prefix}download_csv"
-            )
+            progress.empty()
+            st.info(f"🆕 {len(new_points)} new scene(s) added to the series")
+            failed = len(new_images) - len(new_points)
+            if failed:
+                st.caption(f"⚠️ {failed} scene(s) could not be computed; they will be retried on the next refresh")
             
-            return True
+            points = [point for point in stored
+                      if point['value'] is not None and start_date <= point['date'] <= end]
+            if not points:
+                st.warning("⚠️ Could not calculate time series values.")
+                return False
             
+            df = pd.DataFrame({
+                'Date': pd.to_datetime([point['date'] for point in points]),
+                index_name: [point['value'] for point in points]
+            }).sort_values('Date')
+            
+            self._render_results(df, [index_name])
+            return True
+        
         except Exception as e:
             progress.empty()
             st.error(f"❌ Error: {str(e)}")
             return False
     
+    def _render_results(self, df: pd.DataFrame, index_names: List[str]):
+        """Plot the series with trend lines, statistics, table and CSV export."""
+        single = len(index_names) == 1
+        
+        # Create chart (one overlaid trace per index)
+        fig = px.line(
+            df, x='Date', y=index_names[0] if single else index_names,
+            markers=True,
+            title=f"{', '.join(index_names)} Time Series"
+        )
+        
+        fig.update_layout(
+            xaxis_title="Date",
+            yaxis_title=index_names[0] if single else "Index value",
+            hovermode='x unified',
+            template='plotly_white'
+        )
+        
+        # Add trend lines
+        for name in index_names:
+            series = df[['Date', name]].dropna()
+            if len(series) < 3:
+                continue
+            try:
+                z = pd.to_numeric(series['Date']).values
+                coeffs = np.polyfit(z, series[name].values, 1)
+                trend_y = coeffs[0] * z + coeffs[1]
+                fig.add_trace(go.Scatter(
+                    x=series['Date'], y=trend_y,
+                    mode='lines',
+                    name='Trend' if single else f"{name} trend",
+                    line=dict(dash='dash', color='red') if single else dict(dash='dash')
+                ))
+            except Exception:
+                pass
+        
+        st.plotly_chart(fig, use_container_width=True)
+        
+        # Statistics
+        if single:
+            self._show_statistics(df, index_names[0])
+        else:
+            self._show_multi_statistics(df, index_names)
+        
+        # Data table
+        with st.expander("📋 View Data Table"):
+            st.dataframe(df.set_index('Date'), use_container_width=True)
+        
+        # CSV download (all indices in one file)
+        csv = df.to_csv(index=False)
+        st.download_button(
+            "📥 Download CSV",
+            csv,
+            f"{'_'.join(index_names)}_timeseries.csv",
+            "text/csv",
+            key=f"{self.prefix}download_csv"
+        )
+    
+    def _get_image_means(
+        self,
+        aoi: ee.Geometry,
+        images: List[Dict],
+        sensor: str,
+        index_names: List[str],
+        scale: int,
+        progress
+    ) -> Dict[str, Dict[str, Optional[float]]]:
+        """
+        Get mean index values for each image, consulting the local cache first.
+        
+        Only images with a cache miss for any requested index are sent to
+        Earth Engine, and newly computed values are written back so repeat
+        runs are served from disk. Images that failed to compute are not
+        stored (and not returned), so a transient error never becomes a
+        permanent gap.
+        
+        Returns:
+            Dict of image_id -> {index_name: mean or None}
+        """
+        aoi_fp = geometry_fingerprint(aoi)
+        keys = {
+            img_info['id']: {
+                name: make_stat_key(sensor, img_info['id'], name, aoi_fp, scale)
+                for name in index_names
+            }
+            for img_info in images
+        }
+        
+        try:
+            cache = get_stats_cache()
+            cached = cache.get_many(k for image_keys in keys.values() for k in image_keys.values())
+        except Exception:
+            cache, cached = None, {}
+        
+        means, missing = {}, []
+        for image_id, image_keys in keys.items():
+            if all(k in cached for k in image_keys.values()):
+                means[image_id] = {name: cached[k] for name, k in image_keys.items()}
+            else:
+                missing.append(image_id)
+        
+        if missing:
+            try:
+                computed = self._extract_batch(aoi, missing, sensor, index_names, scale)
+            except Exception as e:
+                if not is_timeout_error(e):
+                    raise
+                st.caption("⏱️ Batch request timed out, processing images individually...")
+                computed = self._extract_per_image(
+                    aoi, missing, sensor, index_names, scale, progress
+                )
+            
+            if cache is not None:
+                try:
+                    cache.put_many({
+                        keys[image_id][name]: value
+                        for image_id, values in computed.items()
+                        for name, value in values.items()
+                    })
+                except Exception:
+                    pass  # Cache is an optimization; never fail the analysis over it
+            means.update(computed)
+        
+        return means
+    
+    def _extract_batch(
+        self,
+        aoi: ee.Geometry,
+        image_ids: List[str],
+        sensor: str,
+        index_names: List[str],
+        scale: int
+    ) -> Dict[str, Dict[str, Optional[float]]]:
+        """
+        Extract all image means with a single server-side reduction.
+        
+        Images without valid pixels come back with None values; images
+        missing from the result failed and are left out, so they are not
+        cached and get computed again on the next run.
+        """
+        return extract_multi_index_means(sensor, image_ids, aoi, index_names, scale)
+    
+    def _extract_per_image(
+        self,
+        aoi: ee.Geometry,
+        image_ids: List[str],
+        sensor: str,
+        index_names: List[str],
+        scale: int,
+        progress
+    ) -> Dict[str, Dict[str, Optional[float]]]:
+        """Fallback: reduce each image with its own request, several at a time."""
+        def reduce_image(image_id):
+            img = get_single_image(sensor, image_id, aoi)
+            if img is None:
+                return {name: None for name in index_names}
+            
+            idx_img = calculate_indices(img, index_names, sensor)
+            
+            # One reduceRegion covers every index band (bestEffort=True)
+            mean_val = idx_img.reduceRegion(
+                reducer=ee.Reducer.mean(),
+                geometry=aoi,
+                scale=scale,
+                maxPixels=1e9,
+                bestEffort=True
+            ).getInfo()
+            return {name: mean_val.get(name) for name in index_names}
+        
+        means = {}
+        results = get_executor().map_unordered(reduce_image, image_ids)
+        for i, result in enumerate(results):
+            progress.progress((i + 1) / len(image_ids), text=f"Processed image {i+1}/{len(image_ids)}...")
+            if result.ok:
+                means[result.key] = result.value
+        
+        return means
+    
     def _show_statistics(self, df: pd.DataFrame, index_name: str):
         """Display statistics for the time series."""
         st.markdown("**📊 Statistics:**")
@@ -191,16 +419,51 @@ class TimeSeriesComponent:
         col4.metric("Max", f"{values.max():.3f}")
         
         # Trend direction
-        if len(values) >= 3:
-            try:
-                z = np.arange(len(values))
-                slope, _ = np.polyfit(z, values.values, 1)
-                
-                if slope > 0.01:
-                    st.success("📈 **Trend: Increasing** (vegetation improving)")
-                elif slope < -0.01:
-                    st.warning("📉 **Trend: Decreasing** (vegetation declining)")
-                else:
-                    st.info("➡️ **Trend: Stable** (minimal change)")
-            except Exception:
-                pass
+        slope = self._trend_slope(values)
+        if slope is not None:
+            if slope > 0.01:
+                st.success("📈 **Trend: Increasing** (vegetation improving)")
+            elif slope < -0.01:
+                st.warning("📉 **Trend: Decreasing** (vegetation declining)")
+            else:
+                st.info("➡️ **Trend: Stable** (minimal change)")
+    
+    def _show_multi_statistics(self, df: pd.DataFrame, index_names: List[str]):
+        """Display a statistics table with one row per index."""
+        st.markdown("**📊 Statistics:**")
+        
+        rows = []
+        for name in index_names:
+            values = df[name].dropna()
+            slope = self._trend_slope(values)
+            if slope is None:
+                trend = "—"
+            elif slope > 0.01:
+                trend = "📈 Increasing"
+            elif slope < -0.01:
+                trend = "📉 Decreasing"
+            else:
+                trend = "➡️ Stable"
+            rows.append({
+                'Index': name,
+                'Mean': round(values.mean(), 3),
+                'Std Dev': round(values.std(), 3),
+                'Min': round(values.min(), 3),
+                'Max': round(values.max(), 3),
+                'Trend': trend,
+            })
+        
+        st.dataframe(pd.DataFrame(rows).set_index('Index'), use_container_width=True)
+    
+    @staticmethod
+    def _trend_slope(values: pd.Series) -> Optional[float]:
+        """Slope of a linear fit over observation order, or None if too short."""
+        values = values.dropna()
+        if len(values) < 3:
+            return None
+        try:
+            z = np.arange(len(values))
+            slope, _ = np.polyfit(z, values.values, 1)
+            return slope
+        except Exception:
+            return None
@@ -16,6 +16,7 @@ from .satellite_data import (
 
 from .vegetation_indices import (
     calculate_index,
+    calculate_indices,
     get_available_indices,
     get_index_vis_params,
     VEGETATION_INDICES,
@@ -32,6 +33,7 @@ __all__ = [
     'get_image_list',
     'get_single_image',
     'calculate_index',
+    'calculate_indices',
     'get_available_indices',
     'get_index_vis_params',
     'VEGETATION_INDICES',
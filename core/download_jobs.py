@@ -0,0 +1,164 @@
+"""
+AgriVision Pro V3 - Background Download Jobs
+=============================================
+In-process queue that runs long exports on worker threads.
+
+Streamlit reruns the whole script on every interaction, so a download run
+inline blocks the page until it finishes. Jobs submitted here run on a
+small dedicated pool (separate from the EE executor, whose workers fetch
+the tiles of a tiled export) and the page polls for their status.
+
+Jobs are keyed by the export's raster cache key: submitting the same
+export twice returns the existing job. Job state is kept in a JSON file so
+it survives reruns; jobs that were still active when the process stopped
+are marked failed on the next start. Workers must not call Streamlit
+functions.
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from .stats_cache import CACHE_DIR
+
+
+DEFAULT_MAX_WORKERS = 2
+
+# Finished jobs kept in the state file
+MAX_FINISHED_JOBS = 50
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+@dataclass
+class DownloadJob:
+    """State of one background export."""
+    key: str
+    label: str
+    status: str = 'queued'
+    result: Any = None
+    error: Optional[str] = None
+    created: float = 0.0
+    finished: Optional[float] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in ACTIVE_STATUSES
+
+
+class DownloadJobQueue:
+    """Worker pool running deduplicated export jobs with persisted state."""
+
+    def __init__(self, path: Optional[Path] = None, max_workers: int = DEFAULT_MAX_WORKERS):
+        self.path = Path(path) if path else CACHE_DIR / 'download_jobs.json'
+        self._pool = ThreadPoolExecutor(max_workers=max_workers,
+                                        thread_name_prefix='download-job')
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, DownloadJob] = self._load()
+
+    def _load(self) -> Dict[str, DownloadJob]:
+        """Read saved jobs; active ones belonged to a previous process."""
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+        jobs = {}
+        for item in saved:
+            job = DownloadJob(**item)
+            if job.active:
+                job.status = 'failed'
+                job.error = 'Interrupted by an application restart'
+            jobs[job.key] = job
+        return jobs
+
+    def _save(self) -> None:
+        """Write job state atomically. Caller holds the lock."""
+        finished = sorted((j for j in self._jobs.values() if not j.active),
+                          key=lambda j: j.finished or 0, reverse=True)
+        for job in finished[MAX_FINISHED_JOBS:]:
+            del self._jobs[job.key]
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump([asdict(job) for job in self._jobs.values()], f)
+        os.replace(tmp_path, self.path)
+
+    def submit(self, key: str, label: str, fn: Callable[[], Any]) -> DownloadJob:
+        """
+        Queue ``fn`` under ``key`` unless an equivalent job is active or done.
+
+        Args:
+            key: Deduplication key (the export's cache key)
+            label: Short description shown to the user
+            fn: Callable doing the export; its JSON-serializable return
+                value is stored as the job result
+
+        Returns:
+            The new or existing job.
+        """
+        with self._lock:
+            existing = self._jobs.get(key)
+            if existing is not None and existing.status != 'failed':
+                return existing
+
+            job = DownloadJob(key=key, label=label, created=time.time())
+            self._jobs[key] = job
+            self._save()
+
+        self._pool.submit(self._run, job, fn)
+        return job
+
+    def _run(self, job: DownloadJob, fn: Callable[[], Any]) -> None:
+        self._update(job, status='running')
+        try:
+            result = fn()
+        except Exception as e:
+            self._update(job, status='failed', error=str(e) or type(e).__name__,
+                         finished=time.time())
+        else:
+            self._update(job, status='done', result=result, finished=time.time())
+
+    def _update(self, job: DownloadJob, **changes) -> None:
+        with self._lock:
+            for name, value in changes.items():
+                setattr(job, name, value)
+            self._save()
+
+    def get(self, key: str) -> Optional[DownloadJob]:
+        """Return the job for a key, if any."""
+        with self._lock:
+            return self._jobs.get(key)
+
+    def list_jobs(self) -> List[DownloadJob]:
+        """All known jobs, newest first."""
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda j: j.created, reverse=True)
+
+    def forget(self, key: str) -> None:
+        """Drop a finished job so its export can be requested again."""
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and not job.active:
+                del self._jobs[key]
+                self._save()
+
+
+_shared_queue: Optional[DownloadJobQueue] = None
+_shared_lock = threading.Lock()
+
+
+def get_download_jobs() -> DownloadJobQueue:
+    """Return the process-wide download job queue."""
+    global _shared_queue
+    with _shared_lock:
+        if _shared_queue is None:
+            _shared_queue = DownloadJobQueue()
+        return _shared_queue
@@ -4,44 +4,343 @@ AgriVision Pro V3 - Download Utilities Module
 Image export and download functions.
 """
 
+import math
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+from dataclasses import dataclass
+
 import ee
 import requests
-from typing import Optional, Tuple
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Optional, Sequence, Tuple
 
+from .ee_executor import get_executor
+from .raster_tiles import (
+    DOWNLOAD_SAFETY_FACTOR, EE_DOWNLOAD_LIMIT_BYTES, GRID_CRS,
+    QUANTIZE_NODATA, QUANTIZE_SCALE,
+    estimate_raster_bytes, mosaic_tiles, plan_tile_grid,
+    write_band_descriptions, write_quantization_tags
+)
 
-def download_ee_image_bytes(
+
+# Seconds allowed per tile (URL request plus transfer)
+TILE_TIMEOUT_SECONDS = 300
+
+# Downloads are streamed to disk in chunks of this size
+STREAM_CHUNK_BYTES = 1 << 20
+
+DOWNLOAD_DIR = os.path.join(tempfile.gettempdir(), 'agrivision_downloads')
+
+# EE converts a metre scale to degrees with this constant for EPSG:4326
+# images (such as composites) when no CRS is given
+EE_METERS_PER_DEGREE = 111319.49
+
+
+# =============================================================================
+# Download Size Estimation
+# =============================================================================
+
+@dataclass
+class DownloadPlan:
+    """Predicted size of an export and how to make it fit the download limit."""
+    requested_scale: int
+    estimated_bytes: int
+    fits: bool
+    single_file_scale: int
+    tile_count: int
+    tiled_bytes: int
+
+
+def estimate_download_bytes(bbox: Sequence[float], scale: float,
+                            bands: int = 1, dtype: str = 'float32') -> int:
+    """Estimate the raw payload of a single getDownloadURL request over a bbox."""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    width = max(1, math.ceil((max_lon - min_lon) * EE_METERS_PER_DEGREE / scale))
+    height = max(1, math.ceil((max_lat - min_lat) * EE_METERS_PER_DEGREE / scale))
+    return estimate_raster_bytes(width, height, bands, dtype)
+
+
+def fit_download_scale(bbox: Sequence[float], scale: int, bands: int = 1,
+                       dtype: str = 'float32',
+                       max_bytes: int = EE_DOWNLOAD_LIMIT_BYTES) -> int:
+    """Finest whole-metre scale at or above ``scale`` that fits in one request."""
+    budget = max_bytes * DOWNLOAD_SAFETY_FACTOR
+    fitted = scale
+    estimate = estimate_download_bytes(bbox, fitted, bands, dtype)
+    while estimate > budget:
+        # Payload shrinks with the square of the scale
+        fitted = max(fitted + 1, math.ceil(fitted * math.sqrt(estimate / budget)))
+        estimate = estimate_download_bytes(bbox, fitted, bands, dtype)
+    return fitted
+
+
+def plan_download(bbox: Sequence[float], scale: int, bands: int = 1,
+                  dtype: str = 'float32') -> DownloadPlan:
+    """Predict export size, the single-file scale and the tile count for a bbox."""
+    estimated = estimate_download_bytes(bbox, scale, bands, dtype)
+    grid = plan_tile_grid(bbox, scale, bands=bands, dtype=dtype)
+    return DownloadPlan(
+        requested_scale=scale,
+        estimated_bytes=estimated,
+        fits=estimated <= EE_DOWNLOAD_LIMIT_BYTES * DOWNLOAD_SAFETY_FACTOR,
+        single_file_scale=fit_download_scale(bbox, scale, bands, dtype),
+        tile_count=len(grid.tiles),
+        tiled_bytes=estimate_raster_bytes(grid.width, grid.height, bands, dtype)
+    )
+
+
+# =============================================================================
+# HTTP Session and Streaming
+# =============================================================================
+
+_http_session: Optional[requests.Session] = None
+_http_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """
+    Return the process-wide pooled HTTP session for download URLs.
+
+    Connections are kept alive and reused across downloads and tiles, and
+    transient 429/5xx responses are retried with backoff by the adapter.
+    """
+    global _http_session
+    with _http_lock:
+        if _http_session is None:
+            retry = Retry(
+                total=3,
+                backoff_factor=0.5,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=['GET']
+            )
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _http_session = session
+        return _http_session
+
+
+def new_download_path(suffix: str = '.tif') -> str:
+    """Create an empty spool file for a download and return its path."""
+    os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=DOWNLOAD_DIR)
+    os.close(fd)
+    return path
+
+
+def stream_url_to_file(url: str, path: str, timeout: int = 120) -> str:
+    """Stream a URL to ``path`` in fixed-size chunks, never buffering the whole body."""
+    with get_http_session().get(url, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        with open(path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=STREAM_CHUNK_BYTES):
+                f.write(chunk)
+    return path
+
+
+def fetch_geotiff(image: ee.Image, params: dict, out_path: str) -> str:
+    """
+    Download an image as a zipped single-file GeoTIFF and unpack it.
+
+    The zipped format cuts transfer size; the size limit itself is applied
+    by EE to the uncompressed pixels either way.
+    """
+    url = image.getDownloadURL({**params, 'format': 'ZIPPED_GEO_TIFF', 'filePerBand': False})
+    zip_path = f"{out_path}.zip"
+    try:
+        stream_url_to_file(url, zip_path)
+        with zipfile.ZipFile(zip_path) as archive:
+            member = next(n for n in archive.namelist() if n.lower().endswith('.tif'))
+            with archive.open(member) as src, open(out_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst, STREAM_CHUNK_BYTES)
+    finally:
+        if os.path.exists(zip_path):
+            os.remove(zip_path)
+    return out_path
+
+
+# =============================================================================
+# Downloads
+# =============================================================================
+
+def download_ee_image_file(
     image: ee.Image,
     aoi: ee.Geometry,
     scale: int,
+    out_path: str,
     name: str = "export",
-    max_attempts: int = 4
-) -> Tuple[Optional[bytes], Optional[int]]:
+    max_attempts: int = 4,
+    bbox: Sequence[float] = None,
+    bands: int = 1,
+    dtype: str = 'float32',
+    band_names: Sequence[str] = None
+) -> Optional[int]:
     """
-    Fetch an Earth Engine image as GeoTIFF bytes.
+    Stream an Earth Engine image to a GeoTIFF file.
 
     Google Earth Engine's direct download URL rejects requests over ~48MB.
-    Large areas or fine resolutions hit that limit, so this retries at
-    progressively coarser scales until the request fits.
+    When the AOI bounding box is given, the scale is predicted up front so
+    the first request fits. Otherwise (or if the estimate was off) this
+    retries at progressively coarser scales until the request fits.
+
+    With ``dtype='int16'`` values are quantized (see quantize_image), which
+    fits twice the pixels of float32 into each request. ``band_names``
+    label the bands of a stacked multi-band export.
 
     Returns:
-        (file_bytes, scale_used) on success, or (None, None) on failure.
+        The scale used on success, or None if the image was still too
+        large after ``max_attempts``.
+
+    Raises:
+        The Earth Engine error for any failure not caused by the size limit.
     """
+    image = _cast(image, dtype)
     current_scale = scale
+    if bbox is not None:
+        current_scale = fit_download_scale(bbox, scale, bands, dtype)
     for _ in range(max_attempts):
         try:
-            url = image.getDownloadURL({
+            fetch_geotiff(image, {
                 'name': name,
                 'scale': current_scale,
                 'region': aoi,
-                'format': 'GEO_TIFF'
-            })
-            response = requests.get(url, timeout=120)
-            response.raise_for_status()
-            return response.content, current_scale
+            }, out_path)
+            if dtype == 'int16':
+                write_quantization_tags(out_path)
+            if band_names:
+                write_band_descriptions(out_path, band_names)
+            return current_scale
         except Exception as e:
             message = str(e).lower()
             if "size" in message or "50331648" in message or "too large" in message:
                 current_scale *= 2
                 continue
+            raise
+    return None
+
+
+def download_ee_image_bytes(
+    image: ee.Image,
+    aoi: ee.Geometry,
+    scale: int,
+    name: str = "export",
+    max_attempts: int = 4,
+    bbox: Sequence[float] = None,
+    bands: int = 1
+) -> Tuple[Optional[bytes], Optional[int]]:
+    """
+    Fetch an Earth Engine image as float32 GeoTIFF bytes.
+
+    Prefer download_ee_image_file, which keeps the file on disk.
+
+    Returns:
+        (file_bytes, scale_used) on success, or (None, None) if the image
+        did not fit the download limit. Other errors are raised.
+    """
+    path = new_download_path()
+    try:
+        used_scale = download_ee_image_file(image, aoi, scale, path, name,
+                                            max_attempts, bbox, bands)
+        if used_scale is None:
             return None, None
-    return None, None
+        with open(path, 'rb') as f:
+            return f.read(), used_scale
+    finally:
+        os.remove(path)
+
+
+def download_ee_image_tiled(
+    image: ee.Image,
+    bbox: Sequence[float],
+    scale: int,
+    out_path: str,
+    name: str = "export",
+    bands: int = 1,
+    dtype: str = 'float32',
+    band_names: Sequence[str] = None
+) -> str:
+    """
+    Export an Earth Engine image at the requested scale as tiles, then mosaic.
+
+    The AOI bounding box is split into a grid of sub-regions that each fit
+    under the direct download limit. Tiles are requested with an explicit
+    CRS transform so they align exactly, fetched concurrently to temporary
+    files, and mosaicked locally into ``out_path``.
+
+    Args:
+        image: Image to export (cast to ``dtype``)
+        bbox: (min_lon, min_lat, max_lon, max_lat) of the AOI
+        scale: Requested resolution in metres, never coarsened
+        out_path: Destination GeoTIFF path
+        name: Base name for the EE download
+        bands: Number of bands in ``image``
+        dtype: Export data type ('float32', or 'int16' to quantize)
+        band_names: Optional labels for the bands of the output
+
+    Returns:
+        ``out_path``
+
+    Raises:
+        RuntimeError: if any tile fails to download.
+    """
+    grid = plan_tile_grid(bbox, scale, bands=bands, dtype=dtype)
+    image = _cast(image, dtype)
+    tile_dir = tempfile.mkdtemp(prefix='agrivision_tiles_')
+
+    def fetch_tile(tile):
+        path = os.path.join(tile_dir, f"tile_{tile.col_off}_{tile.row_off}.tif")
+        return fetch_geotiff(image, {
+            'name': f"{name}_{tile.col_off}_{tile.row_off}",
+            'crs': GRID_CRS,
+            'crs_transform': grid.tile_transform(tile),
+            'dimensions': f"{tile.width}x{tile.height}",
+        }, path)
+
+    try:
+        tile_paths = {}
+        for result in get_executor().map_unordered(fetch_tile, grid.tiles,
+                                                   timeout=TILE_TIMEOUT_SECONDS):
+            if not result.ok:
+                raise RuntimeError(f"Tile download failed: {result.error}")
+            tile_paths[result.key] = result.value
+
+        nodata = QUANTIZE_NODATA if dtype == 'int16' else None
+        mosaic_tiles(grid, tile_paths, out_path, bands=bands, dtype=dtype, nodata=nodata)
+        if dtype == 'int16':
+            write_quantization_tags(out_path)
+        if band_names:
+            write_band_descriptions(out_path, band_names)
+        return out_path
+    finally:
+        shutil.rmtree(tile_dir, ignore_errors=True)
+
+
+def quantize_image(image: ee.Image, factor: int = QUANTIZE_SCALE) -> ee.Image:
+    """
+    Scale index values into int16 for compact export.
+
+    Values are multiplied by ``factor`` and rounded, so the default keeps
+    four decimals over roughly -3.27..3.27. Masked pixels become
+    QUANTIZE_NODATA. Readers get floats back from the scale written by
+    raster_tiles.write_quantization_tags, which GIS tools apply.
+    """
+    return (image.multiply(factor).round()
+            .clamp(QUANTIZE_NODATA + 1, 32767)
+            .unmask(QUANTIZE_NODATA)
+            .toInt16())
+
+
+def _cast(image: ee.Image, dtype: str) -> ee.Image:
+    """Cast every band of an image to the export data type."""
+    casts = {
+        'float32': image.toFloat,
+        'float64': image.toDouble,
+        'int16': lambda: quantize_image(image),
+        'uint8': image.toUint8,
+    }
+    return casts[dtype]()
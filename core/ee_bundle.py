@@ -0,0 +1,37 @@
+"""
+AgriVision Pro V3 - Earth Engine Request Bundling
+==================================================
+Pack several independent server-side values into one ee.Dictionary so they
+are evaluated with a single getInfo round trip instead of one call each.
+"""
+
+import ee
+from typing import Any, Dict, Optional
+
+
+def evaluate_bundle(
+    required: Dict[str, Any],
+    optional: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Evaluate named EE objects together in one request.
+
+    Args:
+        required: Values the caller can't do without
+        optional: Values that may fail server-side (e.g. stats over an empty
+            composite). If the combined request fails, required values are
+            re-evaluated alone and every optional key is returned as None.
+
+    Returns:
+        Dict with the client-side value of every requested key.
+    """
+    optional = optional or {}
+    try:
+        return ee.Dictionary({**required, **optional}).getInfo()
+    except Exception:
+        if not optional:
+            raise
+
+    result = ee.Dictionary(required).getInfo() if required else {}
+    result.update({key: None for key in optional})
+    return result
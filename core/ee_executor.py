@@ -0,0 +1,200 @@
+"""
+AgriVision Pro V3 - Earth Engine Executor
+==========================================
+Bounded-concurrency thread pool for blocking Earth Engine requests.
+
+Each call gets a per-call timeout and is retried with jittered exponential
+backoff on rate limiting (429) and server errors (5xx). Results are yielded
+in completion order so callers can drive a progress bar from real progress.
+
+The executor only runs the callables it is given and never imports ``ee``
+itself, so it can be exercised with a fake client that simulates latency.
+Workers must not call Streamlit functions; update the UI from the thread
+consuming the results.
+"""
+
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_TIMEOUT_SECONDS = 90
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_SECONDS = 1.0
+
+_RETRYABLE_STATUS = re.compile(r'\b(429|500|502|503|504)\b')
+_RETRYABLE_MESSAGES = (
+    'too many requests',
+    'quota',
+    'rate limit',
+    'internal error',
+    'service unavailable',
+    'backend error',
+    'deadline exceeded',
+)
+
+
+@dataclass
+class TaskResult:
+    """Outcome of one submitted call."""
+    key: Any
+    value: Any = None
+    error: Optional[Exception] = None
+    attempts: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """Return True if an error looks like rate limiting or a transient 5xx."""
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        resp = getattr(error, 'resp', None) or getattr(error, 'response', None)
+        status = getattr(resp, 'status', None) or getattr(resp, 'status_code', None)
+    if status is not None:
+        try:
+            status = int(status)
+            return status == 429 or 500 <= status < 600
+        except (TypeError, ValueError):
+            pass
+
+    message = str(error).lower()
+    if _RETRYABLE_STATUS.search(message):
+        return True
+    return any(text in message for text in _RETRYABLE_MESSAGES)
+
+
+class EEExecutor:
+    """Thread pool that runs Earth Engine calls with timeouts and retries."""
+
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        timeout: Optional[float] = DEFAULT_TIMEOUT_SECONDS,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff: float = DEFAULT_BACKOFF_SECONDS,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        """
+        Args:
+            max_workers: Maximum number of concurrent requests
+            timeout: Seconds allowed per call (including retries), None for no limit
+            max_retries: Retries after the first attempt for retryable errors
+            backoff: Base delay in seconds, doubled on each retry with full jitter
+            sleep: Sleep function, replaceable in tests
+        """
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._sleep = sleep
+        self._pool = ThreadPoolExecutor(max_workers=max_workers,
+                                        thread_name_prefix='ee-worker')
+
+    def _call_with_retry(self, fn: Callable, args: tuple, started: Dict, key) -> TaskResult:
+        started[key] = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return TaskResult(key=key, value=fn(*args), attempts=attempt)
+            except Exception as e:
+                if attempt > self.max_retries or not is_retryable_error(e):
+                    return TaskResult(key=key, error=e, attempts=attempt)
+                delay = random.uniform(0, self.backoff * (2 ** (attempt - 1)))
+                self._sleep(delay)
+
+    def map_unordered(
+        self,
+        fn: Callable,
+        items: Iterable,
+        key: Callable[[Any], Any] = None,
+        timeout: Optional[float] = None
+    ) -> Iterator[TaskResult]:
+        """
+        Call ``fn(item)`` for every item and yield results as they complete.
+
+        Args:
+            fn: Blocking function, typically ending in ``.getInfo()``
+            items: Arguments, one call per item
+            key: Maps an item to the ``TaskResult.key`` (defaults to the item)
+            timeout: Per-call timeout override for this batch
+
+        Yields:
+            TaskResult for each item, in completion order. Calls that exceed
+            the timeout yield a TimeoutError; their worker threads are
+            abandoned since EE requests can't be cancelled.
+        """
+        tasks = {(key(item) if key else item): (item,) for item in items}
+        yield from self._run(fn, tasks, timeout)
+
+    def run_all(
+        self,
+        calls: Dict[Any, Callable[[], Any]],
+        timeout: Optional[float] = None
+    ) -> Dict[Any, TaskResult]:
+        """Run a dict of zero-argument callables concurrently, returning results by key."""
+        results = self._run(lambda call: call(), {k: (c,) for k, c in calls.items()}, timeout)
+        return {result.key: result for result in results}
+
+    def _run(self, fn: Callable, tasks: Dict[Any, tuple],
+             timeout: Optional[float] = None) -> Iterator[TaskResult]:
+        timeout = timeout if timeout is not None else self.timeout
+        started: Dict[Any, float] = {}
+        pending = {
+            self._pool.submit(self._call_with_retry, fn, args, started, k): k
+            for k, args in tasks.items()
+        }
+
+        while pending:
+            done, _ = wait(pending, timeout=_poll_interval(pending, started, timeout),
+                           return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.pop(future)
+                yield future.result()
+
+            if timeout is None:
+                continue
+            now = time.monotonic()
+            for future, k in list(pending.items()):
+                start = started.get(k)
+                if start is not None and now - start > timeout:
+                    pending.pop(future)
+                    future.cancel()
+                    yield TaskResult(key=k, error=TimeoutError(
+                        f"Earth Engine request exceeded {timeout}s"))
+
+    def shutdown(self):
+        """Stop accepting work; running calls finish in the background."""
+        self._pool.shutdown(wait=False)
+
+
+def _poll_interval(pending: Dict, started: Dict, timeout: Optional[float]) -> Optional[float]:
+    """Wait until the earliest running call would time out."""
+    if timeout is None:
+        return None
+    now = time.monotonic()
+    deadlines = [started[k] + timeout - now for k in pending.values() if k in started]
+    if not deadlines:
+        return min(1.0, timeout)
+    return max(0.05, min(deadlines))
+
+
+_shared_executor: Optional[EEExecutor] = None
+_shared_lock = threading.Lock()
+
+
+def get_executor() -> EEExecutor:
+    """Return the process-wide executor shared by all sessions."""
+    global _shared_executor
+    with _shared_lock:
+        if _shared_executor is None:
+            _shared_executor = EEExecutor()
+        return _shared_executor
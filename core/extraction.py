@@ -0,0 +1,246 @@
+"""
+AgriVision Pro V3 - Extraction Module
+======================================
+Server-side reductions that pull index statistics for many images in a
+single Earth Engine request instead of one round trip per image.
+"""
+
+import ee
+from typing import Dict, List, Optional
+
+from .ee_executor import get_executor
+from .satellite_data import get_single_image
+from .vegetation_indices import calculate_indices
+
+
+# Seconds to wait for a batched request before falling back to per-image calls
+BATCH_TIMEOUT_SECONDS = 60
+
+
+# =============================================================================
+# Collection Builders
+# =============================================================================
+
+def build_image_collection(sensor: str, image_ids: List[str],
+                           aoi: ee.Geometry) -> ee.ImageCollection:
+    """
+    Build an ImageCollection from image IDs, tagging each with its ID.
+
+    Images are constructed client-side, so this makes no server calls.
+    """
+    images = []
+    for image_id in image_ids:
+        img = get_single_image(sensor, image_id, aoi)
+        if img is not None:
+            images.append(img.set('image_id', image_id))
+    return ee.ImageCollection(images)
+
+
+# =============================================================================
+# Batched Reductions
+# =============================================================================
+
+def extract_multi_index_means(
+    sensor: str,
+    image_ids: List[str],
+    aoi: ee.Geometry,
+    index_names: List[str],
+    scale: int,
+    timeout: Optional[float] = BATCH_TIMEOUT_SECONDS
+) -> Dict[str, Dict[str, Optional[float]]]:
+    """
+    Compute mean values of several indices for every image in one request.
+
+    Each image is turned into one multi-band index image and reduced with a
+    single reduceRegion, mapped over the collection server-side. All values
+    come back from a single getInfo call, so several indices cost about the
+    same as one.
+
+    One bad or inaccessible image fails the whole request, so on any other
+    error than a timeout the batch is split in halves, reduced concurrently,
+    and failing halves are split again until the failing images are
+    isolated; they are left out of the result. When both halves fail with
+    the same error the failure is not tied to particular images, and
+    isolation stops there.
+
+    Returns:
+        Dict of image_id -> {index_name: mean or None}. Images that could
+        not be reduced are omitted, so the result may be partial or empty;
+        callers report the missing images.
+
+    Raises:
+        TimeoutError: if the initial batched request takes longer than
+        ``timeout`` seconds.
+    """
+    if not image_ids:
+        return {}
+
+    try:
+        return _parse_means(
+            _get_info_with_timeout(_means_request(sensor, image_ids, aoi, index_names, scale), timeout),
+            index_names
+        )
+    except Exception as e:
+        if is_timeout_error(e):
+            raise
+        if len(image_ids) == 1:
+            return {}
+
+    return _isolate_failures(sensor, image_ids, aoi, index_names, scale, timeout)
+
+
+def _isolate_failures(
+    sensor: str,
+    image_ids: List[str],
+    aoi: ee.Geometry,
+    index_names: List[str],
+    scale: int,
+    timeout: Optional[float]
+) -> Dict[str, Dict[str, Optional[float]]]:
+    """
+    Reduce the halves of a failed batch concurrently, splitting failing halves again.
+
+    Means of halves that succeed are kept even if the other half times out.
+    """
+    mid = len(image_ids) // 2
+    halves = {'first': image_ids[:mid], 'second': image_ids[mid:]}
+    results = get_executor().run_all(
+        {name: (lambda part=part: _means_request(sensor, part, aoi, index_names, scale).getInfo())
+         for name, part in halves.items()},
+        timeout=timeout
+    )
+
+    errors = [str(result.error) for result in results.values() if not result.ok]
+    if len(errors) == 2 and errors[0] == errors[1]:
+        return {}
+
+    means = {}
+    for name, result in results.items():
+        part = halves[name]
+        if result.ok:
+            means.update(_parse_means(result.value, index_names))
+        elif len(part) > 1 and not is_timeout_error(result.error):
+            means.update(_isolate_failures(sensor, part, aoi, index_names, scale, timeout))
+    return means
+
+
+def _means_request(
+    sensor: str,
+    image_ids: List[str],
+    aoi: ee.Geometry,
+    index_names: List[str],
+    scale: int
+) -> ee.FeatureCollection:
+    """Build the batched reduction of extract_multi_index_means. No server call is made."""
+    collection = build_image_collection(sensor, image_ids, aoi)
+
+    def reduce_image(img):
+        idx_img = calculate_indices(ee.Image(img), index_names, sensor)
+        stats = idx_img.reduceRegion(
+            reducer=ee.Reducer.mean(),
+            geometry=aoi,
+            scale=scale,
+            maxPixels=1e9,
+            bestEffort=True
+        )
+        return ee.Feature(None, stats).set('image_id', img.get('image_id'))
+
+    return collection.map(reduce_image)
+
+
+def _parse_means(result: dict, index_names: List[str]) -> Dict[str, Dict[str, Optional[float]]]:
+    """Turn an evaluated _means_request into image_id -> {index_name: mean}."""
+    means = {}
+    for feature in result.get('features', []):
+        props = feature.get('properties', {})
+        means[props['image_id']] = {name: props.get(name) for name in index_names}
+    return means
+
+
+def is_timeout_error(error: Exception) -> bool:
+    """Return True for client-side timeouts and EE 'Computation timed out' errors."""
+    if isinstance(error, TimeoutError):
+        return True
+    return 'timed out' in str(error).lower()
+
+
+def _get_info_with_timeout(obj, timeout: Optional[float]):
+    """
+    Evaluate an EE object on the shared executor, with retries and a timeout.
+
+    Raises the call's error, or TimeoutError if it takes too long.
+    """
+    result = get_executor().run_all({'request': obj.getInfo}, timeout=timeout)['request']
+    if not result.ok:
+        raise result.error
+    return result.value
+
+
+# =============================================================================
+# Multi-Field Reductions
+# =============================================================================
+
+# getInfo refuses collections over 5000 elements, so requests are sized to fit
+MAX_FEATURES_PER_REQUEST = 5000
+
+
+def build_fields_collection(fields: List[Dict]) -> ee.FeatureCollection:
+    """Build a FeatureCollection from client-side field dicts (field_id, geometry)."""
+    return ee.FeatureCollection([
+        ee.Feature(ee.Geometry(field['geometry']), {'field_id': field['field_id']})
+        for field in fields
+    ])
+
+
+def chunk_image_ids(image_ids: List[str], n_fields: int) -> List[List[str]]:
+    """Split image IDs so each request returns at most MAX_FEATURES_PER_REQUEST rows."""
+    size = max(1, MAX_FEATURES_PER_REQUEST // max(1, n_fields))
+    return [image_ids[i:i + size] for i in range(0, len(image_ids), size)]
+
+
+def extract_field_index_means(
+    sensor: str,
+    image_ids: List[str],
+    fields: List[Dict],
+    index_names: List[str],
+    scale: int
+) -> List[Dict]:
+    """
+    Compute per-field mean values of several indices for a batch of images.
+
+    Every image is reduced over all fields at once with reduceRegions, mapped
+    over the collection server-side and flattened into a single table, so a
+    batch costs one getInfo call. Use chunk_image_ids() to keep batches under
+    Earth Engine's collection size limit.
+
+    Returns:
+        List of rows with field_id, image_id and one value (or None) per index.
+    """
+    if not image_ids or not fields:
+        return []
+
+    fields_fc = build_fields_collection(fields)
+    collection = build_image_collection(sensor, image_ids, fields_fc.geometry().bounds())
+
+    reducer = ee.Reducer.mean()
+    if len(index_names) == 1:
+        # Single-band reductions are named 'mean' unless renamed
+        reducer = reducer.setOutputs(index_names)
+
+    def reduce_image(img):
+        idx_img = calculate_indices(ee.Image(img), index_names, sensor)
+        image_id = img.get('image_id')
+        return (idx_img.reduceRegions(collection=fields_fc, reducer=reducer, scale=scale)
+                .map(lambda f: ee.Feature(None, f.toDictionary()).set('image_id', image_id)))
+
+    result = collection.map(reduce_image).flatten().getInfo()
+
+    rows = []
+    for feature in result.get('features', []):
+        props = feature.get('properties', {})
+        rows.append({
+            'field_id': props.get('field_id'),
+            'image_id': props.get('image_id'),
+            **{name: props.get(name) for name in index_names}
+        })
+    return rows
@@ -0,0 +1,140 @@
+"""
+AgriVision Pro V3 - Geometry Utilities
+=======================================
+Client-side helpers for AOI geometries.
+"""
+
+import hashlib
+import json
+from typing import Any, Iterator, Tuple, Union
+
+import ee
+
+
+# Decimal places kept when fingerprinting coordinates (~0.1 m)
+FINGERPRINT_PRECISION = 6
+
+
+def _round_coordinates(value: Any, precision: int) -> Any:
+    """Recursively round floats in a GeoJSON structure."""
+    if isinstance(value, float):
+        return round(value, precision)
+    if isinstance(value, (list, tuple)):
+        return [_round_coordinates(v, precision) for v in value]
+    if isinstance(value, dict):
+        return {k: _round_coordinates(v, precision) for k, v in value.items()}
+    return value
+
+
+def geometry_fingerprint(aoi: Union[ee.Geometry, dict],
+                         precision: int = FINGERPRINT_PRECISION) -> str:
+    """
+    Deterministic short hash identifying an AOI.
+
+    Geometries built from coordinates are hashed from their rounded GeoJSON,
+    so the same polygon always maps to the same key. Computed geometries
+    (e.g. buffers) fall back to their serialized expression graph. No
+    server calls are made either way.
+    """
+    if isinstance(aoi, dict):
+        geojson = aoi
+    else:
+        try:
+            geojson = aoi.toGeoJSON()
+        except Exception:
+            geojson = None
+
+    if geojson is not None:
+        payload = json.dumps(_round_coordinates(geojson, precision), sort_keys=True)
+    else:
+        payload = aoi.serialize()
+
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+# Pass as ``hash_funcs`` to st.cache_data so EE arguments become part of the
+# cache key instead of being excluded with a leading underscore
+EE_HASH_FUNCS = {ee.Geometry: geometry_fingerprint}
+
+
+# =============================================================================
+# Client-Side GeoJSON Helpers
+# =============================================================================
+
+def _iter_positions(geojson: dict) -> Iterator[Tuple[float, float]]:
+    """Yield every (lon, lat) position in a GeoJSON object."""
+    kind = geojson.get('type')
+    if kind == 'FeatureCollection':
+        for feature in geojson.get('features', []):
+            yield from _iter_positions(feature)
+    elif kind == 'Feature':
+        if geojson.get('geometry'):
+            yield from _iter_positions(geojson['geometry'])
+    elif kind == 'GeometryCollection':
+        for geometry in geojson.get('geometries', []):
+            yield from _iter_positions(geometry)
+    else:
+        stack = [geojson.get('coordinates', [])]
+        while stack:
+            item = stack.pop()
+            if item and isinstance(item[0], (int, float)):
+                yield item[0], item[1]
+            else:
+                stack.extend(item)
+
+
+def geojson_bbox(geojson: dict) -> Tuple[float, float, float, float]:
+    """Bounding box (min_lon, min_lat, max_lon, max_lat) of a GeoJSON object."""
+    lons, lats = zip(*_iter_positions(geojson))
+    return min(lons), min(lats), max(lons), max(lats)
+
+
+def _iter_polygons(geojson: dict) -> Iterator[list]:
+    """Yield the ring lists of every Polygon in a GeoJSON object."""
+    kind = geojson.get('type')
+    if kind == 'FeatureCollection':
+        for feature in geojson.get('features', []):
+            yield from _iter_polygons(feature)
+    elif kind == 'Feature':
+        if geojson.get('geometry'):
+            yield from _iter_polygons(geojson['geometry'])
+    elif kind == 'GeometryCollection':
+        for geometry in geojson.get('geometries', []):
+            yield from _iter_polygons(geometry)
+    elif kind == 'Polygon':
+        yield geojson['coordinates']
+    elif kind == 'MultiPolygon':
+        yield from geojson['coordinates']
+
+
+def geojson_centroid(geojson: dict) -> Tuple[float, float]:
+    """
+    Area-weighted centroid (lon, lat) of a GeoJSON object.
+
+    Computed in planar lon/lat, which matches EE's centroid closely for
+    field-sized areas. Objects without polygon area (points, lines) fall
+    back to the mean of their positions.
+    """
+    total = cx = cy = 0.0
+    for rings in _iter_polygons(geojson):
+        for ring_index, ring in enumerate(rings):
+            # Shoelace formula; holes subtract from their polygon
+            sign = 1.0 if ring_index == 0 else -1.0
+            ring_area = ring_cx = ring_cy = 0.0
+            for (x0, y0), (x1, y1) in zip(ring, ring[1:] + ring[:1]):
+                cross = x0 * y1 - x1 * y0
+                ring_area += cross
+                ring_cx += (x0 + x1) * cross
+                ring_cy += (y0 + y1) * cross
+            # Orientation varies between sources; use magnitudes
+            weight = sign * abs(ring_area)
+            if ring_area:
+                total += weight
+                cx += weight * ring_cx / (3 * ring_area)
+                cy += weight * ring_cy / (3 * ring_area)
+
+    if abs(total) > 1e-18:
+        return cx / total, cy / total
+
+    lons, lats = zip(*_iter_positions(geojson))
+    return sum(lons) / len(lons), sum(lats) / len(lats)
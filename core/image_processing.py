@@ -9,6 +9,17 @@ from PIL import Image
 import io
 from typing import Tuple, Optional
 
+from .index_registry import evaluate_numpy, prepare_bands
+
+
+# Channel of each band symbol in an RGB array
+RGB_CHANNELS = {'RED': 0, 'GREEN': 1, 'BLUE': 2}
+
+
+def _rgb_bands(image: np.ndarray) -> dict:
+    """RGB channels as float32 arrays scaled to 0-1."""
+    return prepare_bands(image, RGB_CHANNELS, scale=1 / 255)
+
 
 def load_uploaded_image(uploaded_file) -> Optional[np.ndarray]:
     """
@@ -43,15 +54,7 @@ def calculate_rgb_ndvi(image: np.ndarray) -> np.ndarray:
     Returns:
         NDVI array (H, W) with values -1 to 1
     """
-    red = image[:, :, 0].astype(float)
-    green = image[:, :, 1].astype(float)
-    
-    # Avoid division by zero
-    denominator = green + red
-    denominator[denominator == 0] = 1
-    
-    ndvi = (green - red) / denominator
-    return ndvi
+    return evaluate_numpy('GRVI', _rgb_bands(image))
 
 
 def calculate_rgb_vari(image: np.ndarray) -> np.ndarray:
@@ -66,15 +69,7 @@ def calculate_rgb_vari(image: np.ndarray) -> np.ndarray:
     Returns:
         VARI array (H, W)
     """
-    red = image[:, :, 0].astype(float)
-    green = image[:, :, 1].astype(float)
-    blue = image[:, :, 2].astype(float)
-    
-    denominator = green + red - blue
-    denominator[denominator == 0] = 1
-    
-    vari = (green - red) / denominator
-    return np.clip(vari, -1, 1)
+    return evaluate_numpy('VARI', _rgb_bands(image))
 
 
 def calculate_rgb_gli(image: np.ndarray) -> np.ndarray:
@@ -89,16 +84,7 @@ def calculate_rgb_gli(image: np.ndarray) -> np.ndarray:
     Returns:
         GLI array (H, W) with values -1 to 1
     """
-    red = image[:, :, 0].astype(float)
-    green = image[:, :, 1].astype(float)
-    blue = image[:, :, 2].astype(float)
-    
-    numerator = 2 * green - red - blue
-    denominator = 2 * green + red + blue
-    denominator[denominator == 0] = 1
-    
-    gli = numerator / denominator
-    return np.clip(gli, -1, 1)
+    return evaluate_numpy('GLI', _rgb_bands(image))
 
 
 def calculate_rgb_exg(image: np.ndarray) -> np.ndarray:
@@ -113,14 +99,11 @@ def calculate_rgb_exg(image: np.ndarray) -> np.ndarray:
     Returns:
         ExG array (H, W), normalized to 0-1 range
     """
-    red = image[:, :, 0].astype(float) / 255
-    green = image[:, :, 1].astype(float) / 255
-    blue = image[:, :, 2].astype(float) / 255
-    
-    exg = 2 * green - red - blue
-    # Normalize to 0-1 range
-    exg = (exg + 1) / 2
-    return np.clip(exg, 0, 1)
+    exg = evaluate_numpy('ExG', _rgb_bands(image))
+    # Normalize to 0-1 range (in place)
+    np.add(exg, 1, out=exg)
+    np.multiply(exg, 0.5, out=exg)
+    return np.clip(exg, 0, 1, out=exg)
 
 
 def calculate_rgb_ngrdi(image: np.ndarray) -> np.ndarray:
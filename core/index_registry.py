@@ -0,0 +1,439 @@
+"""
+AgriVision Pro V3 - Index Registry
+===================================
+Single declarative definition of every vegetation index.
+
+Each index is one formula over named bands (BLUE, GREEN, RED, NIR, SWIR1,
+SWIR2) that compiles to two targets:
+
+- Earth Engine: ``ee.Image.normalizedDifference`` for formulas of the form
+  (A - B) / (A + B), which also masks pixels where either band is
+  negative; otherwise an ``ee.Image.expression`` over the harmonized band
+  names.
+- NumPy: a fused kernel generated from the formula's syntax tree. It
+  evaluates with in-place float32 ufuncs into a small set of reused
+  buffers, instead of allocating a temporary array per operator.
+  Denominators get a tiny epsilon on this path only, since local rasters
+  can contain zero-sum pixels.
+
+Adding an index takes one IndexDefinition entry in INDEX_REGISTRY. Bump
+FORMULA_VERSION whenever a formula or its compilation changes output, so
+statistics cached under the old version are not reused.
+"""
+
+import ast
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, Dict, Mapping, Optional, Tuple
+
+import numpy as np
+
+
+# Formula symbol -> harmonized band name used by core.satellite_data
+BAND_SYMBOLS = {
+    'BLUE': 'blue',
+    'GREEN': 'green',
+    'RED': 'red',
+    'NIR': 'nir',
+    'SWIR1': 'swir1',
+    'SWIR2': 'swir2',
+}
+
+# Added to NumPy denominators to avoid division by zero
+NUMPY_EPS = 1e-7
+
+# Part of every cached statistic's key (see core.stats_cache)
+FORMULA_VERSION = 2
+
+
+@dataclass(frozen=True)
+class IndexDefinition:
+    """One vegetation index and its formula."""
+    key: str
+    name: str
+    description: str
+    expression: str
+    range: Tuple[float, float] = (-1, 1)
+    family: str = 'multispectral'  # 'multispectral' or 'rgb'
+    constants: Mapping[str, float] = field(default_factory=dict)
+    clip: Optional[Tuple[float, float]] = None
+
+    @property
+    def bands(self) -> Tuple[str, ...]:
+        """Band symbols the formula reads, sorted."""
+        names = {node.id for node in ast.walk(ast.parse(self.expression, mode='eval'))
+                 if isinstance(node, ast.Name)}
+        return tuple(sorted(names - set(self.constants)))
+
+
+def _define(*definitions: IndexDefinition) -> Dict[str, IndexDefinition]:
+    return {d.key: d for d in definitions}
+
+
+INDEX_REGISTRY: Dict[str, IndexDefinition] = _define(
+    # Multispectral (satellite and multispectral drone imagery)
+    IndexDefinition(
+        'NDVI', "Normalized Difference Vegetation Index",
+        "Most common vegetation index. Values: -1 to 1 (healthy vegetation > 0.3)",
+        "(NIR - RED) / (NIR + RED)"
+    ),
+    IndexDefinition(
+        'EVI', "Enhanced Vegetation Index",
+        "Improved sensitivity in high biomass areas.",
+        "2.5 * (NIR - RED) / (NIR + 6 * RED - 7.5 * BLUE + 1)"
+    ),
+    IndexDefinition(
+        'SAVI', "Soil Adjusted Vegetation Index",
+        "Minimizes soil brightness influences.",
+        "(1 + L) * (NIR - RED) / (NIR + RED + L)",
+        range=(-1.5, 1.5), constants={'L': 0.5}
+    ),
+    IndexDefinition(
+        'NDWI', "Normalized Difference Water Index",
+        "Detects water content in vegetation.",
+        "(GREEN - NIR) / (GREEN + NIR)"
+    ),
+    IndexDefinition(
+        'NDMI', "Normalized Difference Moisture Index",
+        "Sensitive to moisture levels in vegetation canopy.",
+        "(NIR - SWIR1) / (NIR + SWIR1)"
+    ),
+    IndexDefinition(
+        'GNDVI', "Green NDVI",
+        "Sensitive to chlorophyll concentration.",
+        "(NIR - GREEN) / (NIR + GREEN)"
+    ),
+    IndexDefinition(
+        'NBR', "Normalized Burn Ratio",
+        "Detects burned areas and fire severity.",
+        "(NIR - SWIR2) / (NIR + SWIR2)"
+    ),
+
+    # Visible-band indices (RGB drone and camera imagery, bands scaled 0-1)
+    IndexDefinition(
+        'ExG', "Excess Green", "Excess Green - highlights vegetation",
+        "2 * GREEN - RED - BLUE", range=(-2, 2), family='rgb'
+    ),
+    IndexDefinition(
+        'ExR', "Excess Red", "Excess Red - highlights stressed vegetation",
+        "1.4 * RED - GREEN", range=(-1, 1.4), family='rgb'
+    ),
+    IndexDefinition(
+        'ExGR', "Excess Green minus Excess Red", "Excess Green minus Red - vegetation vs soil",
+        "(2 * GREEN - RED - BLUE) - (1.4 * RED - GREEN)", range=(-3.4, 3), family='rgb'
+    ),
+    IndexDefinition(
+        'GRVI', "Green-Red Vegetation Index", "Green-Red Vegetation Index",
+        "(GREEN - RED) / (GREEN + RED)", family='rgb'
+    ),
+    IndexDefinition(
+        'MGRVI', "Modified Green-Red Vegetation Index", "Modified GRVI - enhanced contrast",
+        "(GREEN ** 2 - RED ** 2) / (GREEN ** 2 + RED ** 2)", family='rgb'
+    ),
+    IndexDefinition(
+        'RGBVI', "RGB Vegetation Index", "RGB Vegetation Index - normalized",
+        "(GREEN ** 2 - BLUE * RED) / (GREEN ** 2 + BLUE * RED)", family='rgb'
+    ),
+    IndexDefinition(
+        'VARI', "Visible Atmospherically Resistant Index",
+        "Designed to minimize atmospheric effects in RGB imagery.",
+        "(GREEN - RED) / (GREEN + RED - BLUE)", family='rgb', clip=(-1, 1)
+    ),
+    IndexDefinition(
+        'GLI', "Green Leaf Index", "Emphasizes green vegetation in RGB images.",
+        "(2 * GREEN - RED - BLUE) / (2 * GREEN + RED + BLUE)", family='rgb', clip=(-1, 1)
+    ),
+)
+
+
+def get_index_definition(key: str) -> IndexDefinition:
+    """Look up an index by key (KeyError if unknown)."""
+    return INDEX_REGISTRY[key]
+
+
+def list_indices(family: str = None, available_bands=None) -> Dict[str, IndexDefinition]:
+    """
+    Indices of a family whose formulas only need the given band symbols.
+
+    Args:
+        family: 'multispectral', 'rgb', or None for all
+        available_bands: Band symbols present, or None for no restriction
+    """
+    return {
+        key: d for key, d in INDEX_REGISTRY.items()
+        if (family is None or d.family == family)
+        and (available_bands is None or set(d.bands) <= set(available_bands))
+    }
+
+
+# =============================================================================
+# Formula Parsing
+# =============================================================================
+
+_ALLOWED_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Name, ast.Constant, ast.Load,
+                  ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.USub, ast.UAdd)
+
+
+def _parse(expression: str, constants: Mapping[str, float]) -> ast.expr:
+    """Parse a formula, substituting constants and rejecting anything else."""
+    tree = ast.parse(expression, mode='eval')
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f"Unsupported syntax in index formula: {expression!r}")
+        if isinstance(node, ast.Name) and node.id not in constants and node.id not in BAND_SYMBOLS:
+            raise ValueError(f"Unknown band {node.id!r} in index formula: {expression!r}")
+
+    class Substitute(ast.NodeTransformer):
+        def visit_Name(self, node):
+            if node.id in constants:
+                return ast.copy_location(ast.Constant(float(constants[node.id])), node)
+            return node
+
+    return Substitute().visit(tree).body
+
+
+def _normalized_difference_bands(tree: ast.expr) -> Optional[Tuple[str, str]]:
+    """(A, B) when a parsed formula is exactly (A - B) / (A + B) over two bands."""
+    if not (isinstance(tree, ast.BinOp) and isinstance(tree.op, ast.Div)):
+        return None
+    num, den = tree.left, tree.right
+    if not (isinstance(num, ast.BinOp) and isinstance(num.op, ast.Sub)
+            and isinstance(den, ast.BinOp) and isinstance(den.op, ast.Add)):
+        return None
+    operands = (num.left, num.right, den.left, den.right)
+    if not all(isinstance(node, ast.Name) for node in operands):
+        return None
+    a, b, c, d = (node.id for node in operands)
+    return (a, b) if (a, b) == (c, d) else None
+
+
+def _merged_constants(definition: IndexDefinition, overrides: Mapping[str, float]) -> Dict[str, float]:
+    unknown = set(overrides) - set(definition.constants)
+    if unknown:
+        raise ValueError(f"{definition.key} has no constants {sorted(unknown)}")
+    return {**definition.constants, **overrides}
+
+
+# =============================================================================
+# Earth Engine Target
+# =============================================================================
+
+def compile_ee(key: str, **constants: float) -> Callable:
+    """
+    Compile an index to a function mapping an ee.Image to a one-band index image.
+
+    The input must carry the harmonized band names (blue, green, red, nir,
+    swir1, swir2); the output band is named after the index.
+    """
+    definition = INDEX_REGISTRY[key]
+    values = _merged_constants(definition, constants)
+    return _compile_ee(key, tuple(sorted(values.items())))
+
+
+@lru_cache(maxsize=None)
+def _compile_ee(key: str, constants: Tuple[Tuple[str, float], ...]) -> Callable:
+    definition = INDEX_REGISTRY[key]
+    tree = _parse(definition.expression, dict(constants))
+    expression = ast.unparse(tree)
+    bands = definition.bands
+    # normalizedDifference masks negative inputs (e.g. Landsat SR after
+    # scaling) and stays within [-1, 1]; the expression would not
+    difference = _normalized_difference_bands(tree)
+
+    def apply(image):
+        if difference is not None:
+            index = image.normalizedDifference([BAND_SYMBOLS[s] for s in difference])
+        else:
+            index = image.expression(
+                expression, {symbol: image.select(BAND_SYMBOLS[symbol]) for symbol in bands}
+            )
+        if definition.clip is not None:
+            index = index.clamp(*definition.clip)
+        return index.rename(key)
+
+    return apply
+
+
+# =============================================================================
+# NumPy Target
+# =============================================================================
+
+_UFUNCS = {
+    ast.Add: 'add',
+    ast.Sub: 'subtract',
+    ast.Mult: 'multiply',
+    ast.Div: 'divide',
+    ast.Pow: 'power',
+}
+
+_FOLD = {
+    ast.Add: lambda a, b: a + b,
+    ast.Sub: lambda a, b: a - b,
+    ast.Mult: lambda a, b: a * b,
+    ast.Div: lambda a, b: a / b,
+    ast.Pow: lambda a, b: a ** b,
+}
+
+
+class _KernelBuilder:
+    """
+    Emit straight-line NumPy code for a formula tree.
+
+    Operands are ('const', value), ('band', name) or ('buf', name). Every
+    operation writes into a buffer: one of its own operands when that is
+    already a buffer, else a buffer freed by an earlier step, else a new
+    one. A formula therefore needs as many buffers as its tree is deep,
+    not one per operator.
+    """
+
+    def __init__(self):
+        self.lines = []
+        self._free = []
+        self._count = 0
+
+    def _buffer(self) -> str:
+        if self._free:
+            return self._free.pop()
+        name = f"_b{self._count}"
+        self._count += 1
+        self.lines.append(f"{name} = np.empty(_shape, dtype=np.float32)")
+        return name
+
+    def _release(self, operand) -> None:
+        if operand[0] == 'buf':
+            self._free.append(operand[1])
+
+    @staticmethod
+    def _ref(operand) -> str:
+        return repr(operand[1]) if operand[0] == 'const' else operand[1]
+
+    def _emit(self, ufunc: str, args, out: str) -> None:
+        refs = ', '.join(self._ref(a) for a in args)
+        self.lines.append(f"np.{ufunc}({refs}, out={out}, dtype=np.float32)")
+
+    def visit(self, node):
+        if isinstance(node, ast.Constant):
+            return ('const', float(node.value))
+        if isinstance(node, ast.Name):
+            return ('band', node.id)
+        if isinstance(node, ast.UnaryOp):
+            operand = self.visit(node.operand)
+            if isinstance(node.op, ast.UAdd):
+                return operand
+            if operand[0] == 'const':
+                return ('const', -operand[1])
+            out = operand[1] if operand[0] == 'buf' else self._buffer()
+            self._emit('negative', [operand], out)
+            return ('buf', out)
+        return self._visit_binop(node)
+
+    def _visit_binop(self, node):
+        op = type(node.op)
+        left, right = self.visit(node.left), self.visit(node.right)
+
+        if left[0] == 'const' and right[0] == 'const':
+            return ('const', _FOLD[op](left[1], right[1]))
+
+        if op is ast.Pow and right == ('const', 2.0):
+            out = left[1] if left[0] == 'buf' else self._buffer()
+            self._emit('square', [left], out)
+            return ('buf', out)
+
+        if op is ast.Div:
+            if right[0] == 'const':
+                if right[1] == 0:
+                    raise ZeroDivisionError("Index formula divides by zero")
+                op, right = ast.Mult, ('const', 1.0 / right[1])
+            else:
+                # Guard the denominator in place (or in a fresh buffer for a band)
+                out = right[1] if right[0] == 'buf' else self._buffer()
+                self._emit('add', [right, ('const', NUMPY_EPS)], out)
+                right = ('buf', out)
+
+        if left[0] == 'buf':
+            out = left[1]
+            self._release(right)
+        elif right[0] == 'buf':
+            out = right[1]
+        else:
+            out = self._buffer()
+        self._emit(_UFUNCS[op], [left, right], out)
+        return ('buf', out)
+
+    def finish(self, root) -> str:
+        if root[0] == 'band':
+            out = self._buffer()
+            self.lines.append(f"np.copyto({out}, {root[1]}, casting='unsafe')")
+            return out
+        if root[0] == 'const':
+            out = self._buffer()
+            self.lines.append(f"{out}.fill({root[1]!r})")
+            return out
+        return root[1]
+
+
+@lru_cache(maxsize=None)
+def _compile_numpy(key: str, constants: Tuple[Tuple[str, float], ...]) -> Callable:
+    definition = INDEX_REGISTRY[key]
+    tree = _parse(definition.expression, dict(constants))
+    bands = definition.bands
+
+    builder = _KernelBuilder()
+    result = builder.finish(builder.visit(tree))
+    if definition.clip is not None:
+        low, high = definition.clip
+        builder.lines.append(f"np.clip({result}, {low!r}, {high!r}, out={result})")
+
+    args = ', '.join(bands)
+    shapes = ', '.join(f"np.shape({band})" for band in bands)
+    body = '\n    '.join(builder.lines)
+    source = (
+        f"def {key.replace('-', '_')}_kernel({args}):\n"
+        f"    _shape = np.broadcast_shapes({shapes})\n"
+        f"    {body}\n"
+        f"    return {result}\n"
+    )
+    namespace = {'np': np}
+    exec(compile(source, f"<index {key}>", 'exec'), namespace)
+    kernel = namespace[f"{key.replace('-', '_')}_kernel"]
+    kernel.source = source
+    return kernel
+
+
+def compile_numpy(key: str, **constants: float) -> Callable[..., np.ndarray]:
+    """
+    Compile an index to a fused NumPy kernel.
+
+    The kernel takes one array per band symbol, as keyword arguments (see
+    IndexDefinition.bands), and returns a new float32 array. Kernels are
+    cached per index and constants.
+    """
+    definition = INDEX_REGISTRY[key]
+    values = _merged_constants(definition, constants)
+    return _compile_numpy(key, tuple(sorted(values.items())))
+
+
+def prepare_bands(img_array: np.ndarray, band_indices: Mapping[str, int],
+                  scale: float = None) -> Dict[str, np.ndarray]:
+    """
+    Slice band symbols out of an (H, W, C) array as float32, scaled in one pass.
+
+    Args:
+        img_array: Image array, channels last
+        band_indices: Band symbol -> channel index
+        scale: Multiplier applied while converting (e.g. 1/255)
+    """
+    bands = {}
+    for symbol, channel in band_indices.items():
+        band = img_array[:, :, channel]
+        if scale is None:
+            bands[symbol] = band.astype(np.float32)
+        else:
+            bands[symbol] = np.multiply(band, scale, dtype=np.float32)
+    return bands
+
+
+def evaluate_numpy(key: str, bands: Mapping[str, np.ndarray], **constants: float) -> np.ndarray:
+    """Evaluate an index over band arrays keyed by symbol (extra bands are ignored)."""
+    kernel = compile_numpy(key, **constants)
+    return kernel(**{symbol: bands[symbol] for symbol in INDEX_REGISTRY[key].bands})
@@ -8,7 +8,165 @@ import streamlit as st
 import folium
 from streamlit_folium import st_folium
 import ee
+import hashlib
+import json
+import threading
 import time
+from typing import Dict, Tuple
+
+from .geometry_utils import geometry_fingerprint
+from .tile_proxy import proxied_tile_url, tile_proxy_enabled
+
+
+OSM_TILES = 'https://tile.openstreetmap.org/{z}/{x}/{y}.png'
+OSM_ATTRIBUTION = '&copy; OpenStreetMap contributors'
+ESRI_IMAGERY_TILES = (
+    'https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}'
+)
+
+
+# =============================================================================
+# Tile URL Cache
+# =============================================================================
+
+# EE map IDs stay valid for about a day; reuse tile URLs well within that
+TILE_URL_TTL_SECONDS = 4 * 3600
+MAX_TILE_URLS = 512
+
+_tile_urls: Dict[str, Tuple[float, str]] = {}
+_tile_urls_lock = threading.Lock()
+
+
+def _normalize_vis_params(vis_params: dict) -> dict:
+    """Copy of vis params with palette colors stripped of any '#' prefix."""
+    vis_params = dict(vis_params)
+    if isinstance(vis_params.get('palette'), list):
+        vis_params['palette'] = [
+            c.replace('#', '') if isinstance(c, str) else c
+            for c in vis_params['palette']
+        ]
+    return vis_params
+
+
+def tile_url_key(ee_image: ee.Image, vis_params: dict) -> str:
+    """Fingerprint of an image graph and its vis params (no server call)."""
+    payload = ee_image.serialize() + json.dumps(
+        _normalize_vis_params(vis_params), sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def get_tile_url(ee_image: ee.Image, vis_params: dict) -> str:
+    """
+    Return the XYZ tile URL template for an image, registering it if needed.
+
+    URLs are shared across reruns, sessions and threads for
+    TILE_URL_TTL_SECONDS, so the same layer only calls getMapId once.
+    Safe to call from executor workers to warm the cache.
+    """
+    vis_params = _normalize_vis_params(vis_params)
+    key = tile_url_key(ee_image, vis_params)
+    now = time.time()
+
+    with _tile_urls_lock:
+        entry = _tile_urls.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+    # Outside the lock so other layers aren't held up by this round trip
+    url = ee_image.getMapId(vis_params)['tile_fetcher'].url_format
+
+    with _tile_urls_lock:
+        _tile_urls[key] = (now + TILE_URL_TTL_SECONDS, url)
+        if len(_tile_urls) > MAX_TILE_URLS:
+            for stale in [k for k, (expires, _) in _tile_urls.items() if expires <= now]:
+                del _tile_urls[stale]
+            # Still full: drop the entries expiring soonest
+            excess = len(_tile_urls) - MAX_TILE_URLS
+            for stale in sorted(_tile_urls, key=lambda k: _tile_urls[k][0])[:max(excess, 0)]:
+                del _tile_urls[stale]
+    return url
+
+
+def clear_tile_url_cache() -> None:
+    """Forget every cached tile URL."""
+    with _tile_urls_lock:
+        _tile_urls.clear()
+
+
+# =============================================================================
+# Map Display
+# =============================================================================
+
+# Built maps kept per session; reusing the same folium objects keeps their
+# element IDs, so an unchanged map serializes to identical HTML
+MAP_CACHE_SESSION_KEY = '_ee_map_cache'
+MAX_CACHED_MAPS = 8
+
+
+def _digest(*parts) -> str:
+    """Short stable hash of JSON-serializable parts."""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def _build_map(center: list, zoom: int, tiles_url: str, layer_name: str,
+               aoi_geojson: dict) -> folium.Map:
+    """Create the folium map with base layers, an optional EE layer and the AOI outline."""
+    m = folium.Map(
+        location=center,
+        zoom_start=zoom,
+        tiles=None,
+        control_scale=True
+    )
+    
+    # Add base layers (through the local tile proxy when enabled)
+    if tile_proxy_enabled():
+        folium.TileLayer(
+            tiles=proxied_tile_url(OSM_TILES),
+            attr=OSM_ATTRIBUTION,
+            name='OpenStreetMap',
+            control=True
+        ).add_to(m)
+    else:
+        folium.TileLayer(
+            tiles='OpenStreetMap',
+            name='OpenStreetMap',
+            control=True
+        ).add_to(m)
+    
+    folium.TileLayer(
+        tiles=proxied_tile_url(ESRI_IMAGERY_TILES),
+        attr='Esri',
+        name='Satellite',
+        control=True
+    ).add_to(m)
+    
+    if tiles_url:
+        folium.TileLayer(
+            tiles=tiles_url,
+            attr='Google Earth Engine',
+            name=layer_name,
+            overlay=True,
+            control=True,
+            show=True
+        ).add_to(m)
+    
+    if aoi_geojson is not None:
+        folium.GeoJson(
+            aoi_geojson,
+            name='Study Area',
+            style_function=lambda x: {
+                'fillColor': 'transparent',
+                'color': '#0066FF',
+                'weight': 3,
+                'fillOpacity': 0
+            }
+        ).add_to(m)
+    
+    # Add layer control
+    folium.LayerControl(position='topright', collapsed=False).add_to(m)
+    return m
 
 
 def display_ee_map(
@@ -18,12 +176,18 @@ def display_ee_map(
     vis_params: dict = None,
     layer_name: str = "Layer",
     aoi: ee.Geometry = None,
+    aoi_geojson: dict = None,
     height: int = 500,
     key: str = None
 ) -> None:
     """
     Display an Earth Engine image on a Folium map using st_folium.
     
+    The map is memoized per session: when the center, zoom, layer, vis
+    params and AOI are unchanged, the previously built map is rendered
+    again under the same deterministic key, so reruns triggered by other
+    widgets don't remount it.
+    
     Args:
         center: [lat, lon] center point
         zoom: Zoom level
@@ -31,8 +195,9 @@ def display_ee_map(
         vis_params: Visualization parameters
         layer_name: Name for the layer
         aoi: Optional AOI geometry to show boundary
+        aoi_geojson: Client-side GeoJSON of the AOI; skips fetching it from EE
         height: Map height in pixels
-        key: Unique key for the map component
+        key: Unique key for the map component (derived from the inputs if omitted)
     """
     # Ensure center is [lat, lon] format
     if isinstance(center, list) and len(center) == 2:
@@ -40,84 +205,90 @@ def display_ee_map(
             center = [center[1], center[0]]
     
     try:
-        # Create base map
-        m = folium.Map(
-            location=center,
-            zoom_start=zoom,
-            tiles=None,
-            control_scale=True
-        )
-        
-        # Add base layers
-        folium.TileLayer(
-            tiles='OpenStreetMap',
-            name='OpenStreetMap',
-            control=True
-        ).add_to(m)
-        
-        folium.TileLayer(
-            tiles='https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}',
-            attr='Esri',
-            name='Satellite',
-            control=True
-        ).add_to(m)
-        
         # Add GEE layer if provided
-        gee_layer_added = False
+        tiles_url = None
+        layer_fp = None
         if ee_image is not None and vis_params is not None:
             try:
-                # Ensure palette colors don't have # prefix
-                if 'palette' in vis_params and isinstance(vis_params['palette'], list):
-                    vis_params['palette'] = [
-                        c.replace('#', '') if isinstance(c, str) else c 
-                        for c in vis_params['palette']
-                    ]
-                
-                map_id_dict = ee_image.getMapId(vis_params)
-                tiles_url = map_id_dict['tile_fetcher'].url_format
-                
-                folium.TileLayer(
-                    tiles=tiles_url,
-                    attr='Google Earth Engine',
-                    name=layer_name,
-                    overlay=True,
-                    control=True,
-                    show=True
-                ).add_to(m)
-                gee_layer_added = True
-                
+                layer_fp = tile_url_key(ee_image, vis_params)
+                # Reuses the tile URL of an identical layer when still fresh
+                tiles_url = proxied_tile_url(get_tile_url(ee_image, vis_params))
             except Exception as e:
                 st.error(f"❌ Could not load GEE layer: {str(e)[:100]}")
         
-        # Add AOI boundary if provided
-        if aoi is not None:
-            try:
-                aoi_geojson = aoi.getInfo()
-                folium.GeoJson(
-                    aoi_geojson,
-                    name='Study Area',
-                    style_function=lambda x: {
-                        'fillColor': 'transparent',
-                        'color': '#0066FF',
-                        'weight': 3,
-                        'fillOpacity': 0
-                    }
-                ).add_to(m)
-            except Exception:
-                pass  # Silently ignore AOI boundary errors
-        
-        # Add layer control
-        folium.LayerControl(position='topright', collapsed=False).add_to(m)
+        aoi_fp = None
+        if aoi_geojson is not None:
+            aoi_fp = geometry_fingerprint(aoi_geojson)
+        elif aoi is not None:
+            aoi_fp = geometry_fingerprint(aoi)
         
-        # Generate unique key if not provided
+        inputs = [center, zoom, layer_name, layer_fp, aoi_fp, height]
         if key is None:
-            key = f"map_{layer_name.replace(' ', '_')}_{int(time.time() * 1000) % 100000}"
+            key = f"map_{_digest(*inputs)}"
+        
+        # A refreshed tile URL or proxy setting means a new map
+        map_id = _digest(key, *inputs, tiles_url)
+        cache = st.session_state.setdefault(MAP_CACHE_SESSION_KEY, {})
+        entry = cache.pop(key, None)
+        if entry is None or entry[0] != map_id:
+            # Add AOI boundary if provided
+            if aoi_geojson is None and aoi is not None:
+                try:
+                    aoi_geojson = aoi.getInfo()
+                except Exception:
+                    pass  # Silently ignore AOI boundary errors
+            entry = (map_id, _build_map(center, zoom, tiles_url, layer_name, aoi_geojson))
+        
+        # Most recently used last; drop the oldest maps beyond the limit
+        cache[key] = entry
+        while len(cache) > MAX_CACHED_MAPS:
+            cache.pop(next(iter(cache)))
+        m = entry[1]
         
         # Render map with st_folium
         st_folium(m, width=700, height=height, key=key, returned_objects=[])
         
-        if gee_layer_added:
+        if tiles_url:
             st.caption(f"✅ {layer_name} layer loaded")
         
     except Exception as e:
         st.error(f"❌ Map rendering error: {str(e)}")
+
+
+def display_preview_map(
+    center: list,
+    zoom: int,
+    thumb_url: str,
+    bbox: tuple,
+    aoi_geojson: dict = None,
+    height: int = 500,
+    key: str = None
+) -> None:
+    """
+    Display a low-resolution thumbnail as an image overlay on a map.
+    
+    Used as a quick preview while the full tile layer is being prepared.
+    
+    Args:
+        center: [lat, lon] center point
+        zoom: Zoom level
+        thumb_url: PNG thumbnail URL (e.g. from getThumbURL) covering ``bbox``
+        bbox: (min_lon, min_lat, max_lon, max_lat) the thumbnail spans
+        aoi_geojson: Optional AOI outline
+        height: Map height in pixels
+        key: Unique key for the map component
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    try:
+        m = _build_map(center, zoom, None, "Preview", aoi_geojson)
+        folium.raster_layers.ImageOverlay(
+            image=thumb_url,
+            bounds=[[min_lat, min_lon], [max_lat, max_lon]],
+            name='Preview',
+            opacity=0.85
+        ).add_to(m)
+        st_folium(m, width=700, height=height, key=key or f"preview_{_digest(thumb_url)}",
+                  returned_objects=[])
+        st.caption("⏳ Low-resolution preview; loading full-resolution layer...")
+    except Exception as e:
+        st.error(f"❌ Map rendering error: {str(e)}")
@@ -0,0 +1,176 @@
+"""
+AgriVision Pro V3 - Raster Cache
+=================================
+Content-addressed on-disk cache of exported GeoTIFFs.
+
+An export is fully determined by the serialized EE image graph, the region
+and the scale, so a fingerprint of those is used as the cache key. Repeat
+downloads of the same map are then served from disk without any Earth
+Engine round trip. Files live next to a small SQLite index that tracks
+size and last access, and the least recently used rasters are evicted once
+the cache grows past its disk budget.
+"""
+
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import ee
+
+from .stats_cache import CACHE_DIR, connect_sqlite
+
+
+RASTER_CACHE_DIR = Path(os.environ.get('AGRIVISION_RASTER_CACHE_DIR',
+                                       CACHE_DIR / 'rasters'))
+
+# Disk budget in megabytes
+DEFAULT_MAX_MB = int(os.environ.get('AGRIVISION_RASTER_CACHE_MB', 2048))
+
+
+@dataclass
+class CachedRaster:
+    """A GeoTIFF stored in the cache and the scale it was exported at."""
+    path: str
+    scale: int
+
+
+def image_fingerprint(image: ee.Image) -> str:
+    """Hash of an image's serialized expression graph (no server call)."""
+    return hashlib.sha256(image.serialize().encode('utf-8')).hexdigest()
+
+
+def raster_cache_key(image_fp: str, region_fp: str, scale: int, variant: str = '') -> str:
+    """
+    Build the cache key of one export.
+
+    Args:
+        image_fp: image_fingerprint of the exported image
+        region_fp: geometry_fingerprint of the export region
+        scale: Requested scale in metres
+        variant: Anything else that changes the file (export mode, dtype)
+    """
+    payload = f"{image_fp}|{region_fp}|{int(scale)}|{variant}"
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+
+class RasterCache:
+    """Directory of exported rasters with an LRU disk budget."""
+
+    def __init__(self, directory: Optional[Path] = None, max_mb: int = DEFAULT_MAX_MB):
+        self.directory = Path(directory) if directory else RASTER_CACHE_DIR
+        self.max_bytes = max_mb * 1024 * 1024
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS rasters (
+                    key TEXT PRIMARY KEY,
+                    filename TEXT NOT NULL,
+                    scale INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    accessed REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS rasters_accessed ON rasters (accessed)")
+
+    def _connect(self):
+        return connect_sqlite(self.directory / 'index.sqlite')
+
+    def get(self, key: str) -> Optional[CachedRaster]:
+        """
+        Return the cached raster for a key, or None if absent.
+
+        The file can still be evicted by a concurrent put before the caller
+        opens it; readers should treat FileNotFoundError as a miss.
+        """
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT filename, scale FROM rasters WHERE key=?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            path = self.directory / row[0]
+            if not path.exists():
+                # Removed behind our back; forget it
+                conn.execute("DELETE FROM rasters WHERE key=?", (key,))
+                return None
+
+            conn.execute("UPDATE rasters SET accessed=? WHERE key=?", (time.time(), key))
+        return CachedRaster(path=str(path), scale=row[1])
+
+    def put(self, key: str, src_path: str, scale: int, suffix: str = '.tif') -> CachedRaster:
+        """
+        Move a finished export into the cache, then evict if over budget.
+
+        Args:
+            key: raster_cache_key of the export
+            src_path: File to take ownership of
+            scale: Scale the file was actually exported at
+            suffix: File extension to keep
+
+        Returns:
+            The cached raster, at its new location.
+        """
+        filename = f"{key}{suffix}"
+        path = self.directory / filename
+        shutil.move(src_path, path)
+        size = path.stat().st_size
+
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO rasters (key, filename, scale, size, accessed) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, filename, int(scale), size, time.time())
+            )
+            self._evict(conn, keep=key)
+        return CachedRaster(path=str(path), scale=int(scale))
+
+    def _evict(self, conn: sqlite3.Connection, keep: str) -> None:
+        """Delete least recently used rasters until the cache fits its budget."""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM rasters").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = conn.execute(
+            "SELECT key, filename, size FROM rasters WHERE key != ? ORDER BY accessed ASC",
+            (keep,)
+        ).fetchall()
+        for key, filename, size in rows:
+            if total <= self.max_bytes:
+                break
+            try:
+                (self.directory / filename).unlink()
+            except OSError:
+                pass
+            conn.execute("DELETE FROM rasters WHERE key=?", (key,))
+            total -= size
+
+    def clear(self) -> None:
+        """Remove every cached raster."""
+        with self._lock, self._connect() as conn:
+            for (filename,) in conn.execute("SELECT filename FROM rasters").fetchall():
+                try:
+                    (self.directory / filename).unlink()
+                except OSError:
+                    pass
+            conn.execute("DELETE FROM rasters")
+
+
+_shared_cache: Optional[RasterCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_raster_cache() -> RasterCache:
+    """Return the process-wide raster cache."""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = RasterCache()
+        return _shared_cache
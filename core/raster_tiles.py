@@ -0,0 +1,239 @@
+"""
+AgriVision Pro V3 - Raster Tiling Utilities
+============================================
+Plan a pixel grid over an AOI that is split into tiles small enough for
+Earth Engine's direct download limit, and mosaic the downloaded tiles back
+into a single GeoTIFF.
+
+Everything here is local. The mosaic step copies each downloaded tile into
+the output file one block window at a time, so neither the full raster nor
+a whole tile is held in memory. It can be tested with synthetic tiles
+written by rasterio. rasterio is imported lazily and only needed for
+mosaicking and tagging exports.
+"""
+
+import math
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence
+
+# getDownloadURL rejects requests whose raw pixel payload exceeds 48 MiB
+EE_DOWNLOAD_LIMIT_BYTES = 50331648
+
+# Headroom for GeoTIFF headers and EE's own size accounting
+DOWNLOAD_SAFETY_FACTOR = 0.9
+
+# Metres per degree of latitude / of longitude at the equator
+METERS_PER_DEGREE_LAT = 110574.0
+METERS_PER_DEGREE_LON = 111320.0
+
+GRID_CRS = 'EPSG:4326'
+
+# Internal tile size of mosaicked GeoTIFFs; download tiles are multiples of it
+MOSAIC_BLOCK_SIZE = 256
+
+# Quantized int16 exports store round(value * QUANTIZE_SCALE)
+QUANTIZE_SCALE = 10000
+QUANTIZE_NODATA = -32768
+
+BYTES_PER_PIXEL = {
+    'uint8': 1, 'int8': 1,
+    'uint16': 2, 'int16': 2,
+    'uint32': 4, 'int32': 4, 'float32': 4,
+    'float64': 8,
+}
+
+
+@dataclass(frozen=True)
+class Tile:
+    """A window of the output grid, in pixel offsets."""
+    col_off: int
+    row_off: int
+    width: int
+    height: int
+
+
+@dataclass
+class TileGrid:
+    """Pixel grid in EPSG:4326 covering an AOI bounding box."""
+    x0: float
+    y0: float
+    dx: float
+    dy: float
+    width: int
+    height: int
+    tiles: List[Tile] = field(default_factory=list)
+
+    @property
+    def transform(self) -> List[float]:
+        """Affine transform [a, b, c, d, e, f] of the full grid."""
+        return [self.dx, 0.0, self.x0, 0.0, -self.dy, self.y0]
+
+    def tile_transform(self, tile: Tile) -> List[float]:
+        """Affine transform of one tile, aligned to the full grid."""
+        return [self.dx, 0.0, self.x0 + tile.col_off * self.dx,
+                0.0, -self.dy, self.y0 - tile.row_off * self.dy]
+
+
+def estimate_raster_bytes(width: int, height: int, bands: int, dtype: str = 'float32') -> int:
+    """Raw payload size of a raster, as counted against the download limit."""
+    return width * height * bands * BYTES_PER_PIXEL[dtype]
+
+
+def _block_aligned(size: int) -> int:
+    """Round a tile size down to whole output blocks, if at least one fits."""
+    if size < MOSAIC_BLOCK_SIZE:
+        return size
+    return size - size % MOSAIC_BLOCK_SIZE
+
+
+def plan_tile_grid(
+    bbox: Sequence[float],
+    scale: float,
+    bands: int = 1,
+    dtype: str = 'float32',
+    max_bytes: int = EE_DOWNLOAD_LIMIT_BYTES
+) -> TileGrid:
+    """
+    Lay out a grid at ``scale`` metres over a bbox and split it into tiles.
+
+    Pixel size in degrees is derived at the bbox's central latitude, so
+    pixels are approximately ``scale`` metres on each side.
+
+    Args:
+        bbox: (min_lon, min_lat, max_lon, max_lat)
+        scale: Pixel size in metres
+        bands: Number of bands exported
+        dtype: Export data type (see BYTES_PER_PIXEL)
+        max_bytes: Per-request download limit
+
+    Returns:
+        TileGrid whose tiles each fit under the limit.
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    mid_lat = math.radians((min_lat + max_lat) / 2)
+
+    dy = scale / METERS_PER_DEGREE_LAT
+    dx = scale / (METERS_PER_DEGREE_LON * max(math.cos(mid_lat), 1e-6))
+
+    width = max(1, math.ceil((max_lon - min_lon) / dx))
+    height = max(1, math.ceil((max_lat - min_lat) / dy))
+
+    budget = int(max_bytes * DOWNLOAD_SAFETY_FACTOR)
+    max_pixels = max(1, budget // (bands * BYTES_PER_PIXEL[dtype]))
+
+    # Square-ish tiles, as large as the budget allows. Unless a tile spans
+    # the grid, its size is a whole number of output blocks, so no
+    # compressed block straddles two tiles (only the last column and row
+    # are partial)
+    tile_size = max(1, int(math.sqrt(max_pixels)))
+    tile_w = min(width, tile_size)
+    if tile_w < width:
+        tile_w = _block_aligned(tile_w)
+    tile_h = min(height, max(1, max_pixels // tile_w))
+    if tile_h < height:
+        tile_h = _block_aligned(tile_h)
+
+    tiles = [
+        Tile(col, row, min(tile_w, width - col), min(tile_h, height - row))
+        for row in range(0, height, tile_h)
+        for col in range(0, width, tile_w)
+    ]
+    return TileGrid(x0=min_lon, y0=max_lat, dx=dx, dy=dy,
+                    width=width, height=height, tiles=tiles)
+
+
+def mosaic_tiles(
+    grid: TileGrid,
+    tile_paths: Dict[Tile, str],
+    out_path: str,
+    bands: int,
+    dtype: str = 'float32',
+    nodata: float = None
+) -> str:
+    """
+    Write downloaded tiles into one GeoTIFF covering the whole grid.
+
+    Each tile is copied in MOSAIC_BLOCK_SIZE-square windows, which line up
+    with the output's blocks because tile offsets are multiples of the
+    block size. Peak memory is one window across all bands (about 1.8 MB
+    for seven float32 bands), regardless of tile or mosaic size.
+
+    Args:
+        grid: Grid the tiles were requested on
+        tile_paths: GeoTIFF path for each tile of ``grid.tiles``
+        out_path: Destination file
+        bands: Band count of every tile
+        dtype: Output data type
+        nodata: Optional nodata value recorded in the output
+
+    Returns:
+        ``out_path``
+    """
+    import rasterio
+    from rasterio.transform import Affine
+    from rasterio.windows import Window
+
+    a, b, c, d, e, f = grid.transform
+    profile = {
+        'driver': 'GTiff',
+        'width': grid.width,
+        'height': grid.height,
+        'count': bands,
+        'dtype': dtype,
+        'crs': GRID_CRS,
+        'transform': Affine(a, b, c, d, e, f),
+        'compress': 'deflate',
+        'BIGTIFF': 'IF_SAFER',
+    }
+    if grid.width >= MOSAIC_BLOCK_SIZE and grid.height >= MOSAIC_BLOCK_SIZE:
+        profile.update(tiled=True, blockxsize=MOSAIC_BLOCK_SIZE, blockysize=MOSAIC_BLOCK_SIZE)
+    if nodata is not None:
+        profile['nodata'] = nodata
+
+    with rasterio.open(out_path, 'w', **profile) as dst:
+        for tile in grid.tiles:
+            with rasterio.open(tile_paths[tile]) as src:
+                # EE may return a pixel more or less at edges; crop to the tile
+                width = min(tile.width, src.width)
+                height = min(tile.height, src.height)
+                for row in range(0, height, MOSAIC_BLOCK_SIZE):
+                    for col in range(0, width, MOSAIC_BLOCK_SIZE):
+                        w = min(MOSAIC_BLOCK_SIZE, width - col)
+                        h = min(MOSAIC_BLOCK_SIZE, height - row)
+                        data = src.read(window=Window(col, row, w, h))
+                        dst.write(data.astype(dtype, copy=False),
+                                  window=Window(tile.col_off + col, tile.row_off + row, w, h))
+
+    return out_path
+
+
+# =============================================================================
+# Quantized Exports
+# =============================================================================
+
+def write_quantization_tags(path: str, factor: int = QUANTIZE_SCALE,
+                            nodata: int = QUANTIZE_NODATA) -> str:
+    """
+    Record the int16 quantization of a GeoTIFF in its metadata.
+
+    The per-band scale (1 / factor) is written as the GDAL scale, which
+    GIS tools apply automatically, and also as a ``scale_factor`` tag.
+    """
+    import rasterio
+
+    with rasterio.open(path, 'r+') as dst:
+        dst.nodata = nodata
+        dst.scales = [1.0 / factor] * dst.count
+        dst.offsets = [0.0] * dst.count
+        dst.update_tags(scale_factor=str(1.0 / factor), quantized='int16')
+    return path
+
+
+def write_band_descriptions(path: str, names: Sequence[str]) -> str:
+    """Label the bands of a GeoTIFF (e.g. with index names) for GIS tools."""
+    import rasterio
+
+    with rasterio.open(path, 'r+') as dst:
+        for band, name in enumerate(names, start=1):
+            dst.set_band_description(band, name)
+    return path
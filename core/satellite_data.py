@@ -9,6 +9,8 @@ import streamlit as st
 import ee
 from typing import List, Dict, Optional
 
+from .geometry_utils import EE_HASH_FUNCS
+
 
 # =============================================================================
 # Cloud Masking Functions
@@ -140,12 +142,15 @@ def get_adaptive_scale_for_area(area_km2: float, sensor: str) -> int:
 # Image List and Single Image Retrieval
 # =============================================================================
 
-@st.cache_data(ttl=3600, show_spinner="Searching for images...")
+@st.cache_data(ttl=3600, show_spinner="Searching for images...", hash_funcs=EE_HASH_FUNCS)
 def get_image_list(sensor: str, start_date: str, end_date: str, 
-                   _aoi, max_cloud: int = 100, limit: int = 100) -> List[Dict]:
-    """Get list of available images with metadata."""
-    aoi = _aoi
+                   aoi: ee.Geometry, max_cloud: int = 100, limit: int = 100) -> List[Dict]:
+    """
+    Get list of available images with metadata.
     
+    The AOI is hashed by its geometry fingerprint, so different farms never
+    share a cached scene list and entries are safe to share across sessions.
+    """
     if sensor == "Sentinel-2":
         collection = (ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED')
                      .filterDate(start_date, end_date)
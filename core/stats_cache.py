@@ -0,0 +1,232 @@
+"""
+AgriVision Pro V3 - Statistics Cache
+=====================================
+Persistent on-disk cache of per-image index statistics.
+
+A mean for (sensor, image id, index and formula version, AOI fingerprint,
+scale) never changes, so results are stored in a local SQLite file and
+reused across reruns and process restarts. The least recently used
+entries are evicted once the cache grows past its entry budget.
+
+The same file also remembers the last series computed for an AOI, sensor
+and index, so monitored fields can be refreshed incrementally. Series not
+used for the longest time are dropped beyond a series budget.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .index_registry import FORMULA_VERSION
+
+
+CACHE_DIR = Path(os.environ.get('AGRIVISION_CACHE_DIR',
+                                Path.home() / '.cache' / 'agrivision'))
+
+# Roughly 100 bytes per row, so the default keeps the file around 20 MB
+DEFAULT_MAX_ENTRIES = 200_000
+
+# Stored series kept for incremental refresh
+DEFAULT_MAX_SERIES = 500
+
+StatKey = Tuple[str, str, str, str, int]
+
+
+@contextmanager
+def connect_sqlite(path: Path):
+    """Open a WAL-mode SQLite connection, committing on success and always closing."""
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _versioned(index_name: str) -> str:
+    """Index name tagged with the formula version it was computed with."""
+    return f"{index_name}@v{FORMULA_VERSION}"
+
+
+def make_stat_key(sensor: str, image_id: str, index_name: str,
+                  aoi_fingerprint: str, scale: int) -> StatKey:
+    """Build the cache key for one image statistic."""
+    return (sensor, image_id, _versioned(index_name), aoi_fingerprint, int(scale))
+
+
+def make_series_key(sensor: str, index_name: str, aoi_fingerprint: str,
+                    scale: int, max_cloud: int) -> str:
+    """
+    Build the key identifying a stored time series.
+
+    The date window is not part of the key: a series keeps every scene
+    computed for it, and callers pick the points of their window.
+    """
+    return f"{sensor}|{_versioned(index_name)}|{aoi_fingerprint}|{int(scale)}|{int(max_cloud)}"
+
+
+class StatsCache:
+    """SQLite-backed cache of scalar index statistics with LRU eviction."""
+
+    def __init__(self, path: Optional[Path] = None, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_series: int = DEFAULT_MAX_SERIES):
+        self.path = Path(path) if path else CACHE_DIR / 'stats.sqlite'
+        self.max_entries = max_entries
+        self.max_series = max_series
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS image_stats (
+                    sensor TEXT NOT NULL,
+                    image_id TEXT NOT NULL,
+                    index_name TEXT NOT NULL,
+                    aoi TEXT NOT NULL,
+                    scale INTEGER NOT NULL,
+                    value REAL,
+                    accessed REAL NOT NULL,
+                    PRIMARY KEY (sensor, image_id, index_name, aoi, scale)
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS image_stats_accessed ON image_stats (accessed)"
+            )
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS series_points (
+                    series_key TEXT NOT NULL,
+                    image_id TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    value REAL,
+                    PRIMARY KEY (series_key, image_id)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS series (
+                    series_key TEXT PRIMARY KEY,
+                    accessed REAL NOT NULL
+                )
+            """)
+
+    def _connect(self):
+        return connect_sqlite(self.path)
+
+    def get_many(self, keys: Iterable[StatKey]) -> Dict[StatKey, Optional[float]]:
+        """
+        Look up several statistics at once.
+
+        Returns:
+            Dict containing only the keys found. A value of None means the
+            image was computed before and had no valid pixels.
+        """
+        keys = list(keys)
+        if not keys:
+            return {}
+
+        found = {}
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            for key in keys:
+                row = conn.execute(
+                    "SELECT value FROM image_stats WHERE sensor=? AND image_id=? "
+                    "AND index_name=? AND aoi=? AND scale=?", key
+                ).fetchone()
+                if row is not None:
+                    found[key] = row[0]
+            conn.executemany(
+                "UPDATE image_stats SET accessed=? WHERE sensor=? AND image_id=? "
+                "AND index_name=? AND aoi=? AND scale=?",
+                [(now,) + key for key in found]
+            )
+        return found
+
+    def put_many(self, values: Dict[StatKey, Optional[float]]) -> None:
+        """Store several statistics, then evict if over budget."""
+        if not values:
+            return
+
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO image_stats "
+                "(sensor, image_id, index_name, aoi, scale, value, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [key + (value, now) for key, value in values.items()]
+            )
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Drop the least recently used rows beyond max_entries."""
+        count = conn.execute("SELECT COUNT(*) FROM image_stats").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM image_stats WHERE rowid IN ("
+                "SELECT rowid FROM image_stats ORDER BY accessed ASC LIMIT ?)",
+                (excess,)
+            )
+
+    def get_series(self, series_key: str) -> List[Dict]:
+        """Return the stored points of a series, oldest first."""
+        with self._lock, self._connect() as conn:
+            rows = conn.execute(
+                "SELECT image_id, date, value FROM series_points "
+                "WHERE series_key=? ORDER BY date ASC", (series_key,)
+            ).fetchall()
+            conn.execute("UPDATE series SET accessed=? WHERE series_key=?",
+                         (time.time(), series_key))
+        return [{'id': image_id, 'date': date, 'value': value}
+                for image_id, date, value in rows]
+
+    def append_series(self, series_key: str, points: Iterable[Dict]) -> None:
+        """Add points (dicts with id, date and value) to a stored series."""
+        rows = [(series_key, p['id'], p['date'], p['value']) for p in points]
+        if not rows:
+            return
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO series_points (series_key, image_id, date, value) "
+                "VALUES (?, ?, ?, ?)", rows
+            )
+            conn.execute("INSERT OR REPLACE INTO series (series_key, accessed) VALUES (?, ?)",
+                         (series_key, time.time()))
+            self._evict_series(conn)
+
+    def _evict_series(self, conn: sqlite3.Connection) -> None:
+        """Drop the least recently used series beyond max_series, with their points."""
+        count = conn.execute("SELECT COUNT(*) FROM series").fetchone()[0]
+        excess = count - self.max_series
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM series WHERE series_key IN ("
+                "SELECT series_key FROM series ORDER BY accessed ASC LIMIT ?)",
+                (excess,)
+            )
+        # Also removes points of series stored before the series table existed
+        conn.execute(
+            "DELETE FROM series_points WHERE series_key NOT IN (SELECT series_key FROM series)"
+        )
+
+    def clear(self) -> None:
+        """Remove every cached statistic and stored series."""
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM image_stats")
+            conn.execute("DELETE FROM series_points")
+            conn.execute("DELETE FROM series")
+
+
+_shared_cache: Optional[StatsCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_stats_cache() -> StatsCache:
+    """Return the process-wide statistics cache."""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = StatsCache()
+        return _shared_cache
@@ -0,0 +1,265 @@
+"""
+AgriVision Pro V3 - Statistics Engine
+======================================
+Region statistics for index images from a single combined reducer.
+
+Percentiles, mean, standard deviation, min/max, pixel count and a
+fixed-bin histogram are computed by one reducer built with
+``sharedInputs``. One reduceRegion (one round trip) gives every
+statistic for every band of the image.
+"""
+
+import ee
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .index_registry import get_index_definition
+
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+HISTOGRAM_BINS = 40
+
+# Histogram range for bands the index registry doesn't know
+DEFAULT_HISTOGRAM_RANGE = (-1.0, 1.0)
+
+
+@dataclass
+class BandStats:
+    """Statistics of one band over a region."""
+    band: str
+    count: int
+    mean: Optional[float] = None
+    std: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+    percentiles: Dict[int, float] = field(default_factory=dict)
+    # (bin start, bin end, pixel count) per bin
+    histogram: List[Tuple[float, float, int]] = field(default_factory=list)
+
+    @property
+    def median(self) -> Optional[float]:
+        return self.percentiles.get(50)
+
+
+# =============================================================================
+# Reducer
+# =============================================================================
+
+def build_stats_reducer(
+    hist_range: Tuple[float, float] = DEFAULT_HISTOGRAM_RANGE,
+    bins: int = HISTOGRAM_BINS,
+    percentiles: Sequence[int] = DEFAULT_PERCENTILES
+) -> ee.Reducer:
+    """
+    Combine percentile, mean, stdDev, minMax, count and fixedHistogram.
+
+    With sharedInputs every reducer sees the same band, so outputs are
+    named ``<band>_p5``, ``<band>_mean``, ``<band>_stdDev``, ``<band>_min``,
+    ``<band>_max``, ``<band>_count`` and ``<band>_histogram``.
+    """
+    return (
+        ee.Reducer.percentile(list(percentiles))
+        .combine(ee.Reducer.mean(), sharedInputs=True)
+        .combine(ee.Reducer.stdDev(), sharedInputs=True)
+        .combine(ee.Reducer.minMax(), sharedInputs=True)
+        .combine(ee.Reducer.count(), sharedInputs=True)
+        .combine(ee.Reducer.fixedHistogram(hist_range[0], hist_range[1], bins),
+                 sharedInputs=True)
+    )
+
+
+def histogram_range(index_names: Iterable[str]) -> Tuple[float, float]:
+    """
+    Range covering the nominal value ranges of the given indices.
+
+    A reducer has one histogram range for all bands, so a multi-index
+    image uses the union of its indices' ranges.
+    """
+    lows, highs = [], []
+    for name in index_names:
+        try:
+            low, high = get_index_definition(name).range
+        except KeyError:
+            low, high = DEFAULT_HISTOGRAM_RANGE
+        lows.append(low)
+        highs.append(high)
+    if not lows:
+        return DEFAULT_HISTOGRAM_RANGE
+    return float(min(lows)), float(max(highs))
+
+
+def region_stats(
+    image: ee.Image,
+    band_names: Sequence[str],
+    geometry: ee.Geometry,
+    scale: float,
+    bins: int = HISTOGRAM_BINS,
+    percentiles: Sequence[int] = DEFAULT_PERCENTILES
+) -> ee.Dictionary:
+    """
+    Build the reduction of all statistics for every band of an index image.
+
+    No server call is made; evaluate the result, e.g. in a bundle.
+
+    Args:
+        image: Index image, one band per index
+        band_names: Its band (index) names, to pick the histogram range
+        geometry: Region to reduce over
+        scale: Pixel size in meters
+        bins: Number of histogram bins
+        percentiles: Percentiles to compute
+
+    Returns:
+        ee.Dictionary of raw reducer outputs; see parse_band_stats.
+    """
+    reducer = build_stats_reducer(histogram_range(band_names), bins, percentiles)
+    return image.reduceRegion(
+        reducer=reducer,
+        geometry=geometry,
+        scale=scale,
+        maxPixels=1e9,
+        bestEffort=True
+    )
+
+
+def parse_band_stats(raw: Optional[dict], band: str) -> Optional[BandStats]:
+    """
+    Turn raw reducer outputs for one band into BandStats.
+
+    Args:
+        raw: Evaluated region_stats dictionary
+        band: Band (index) name
+
+    Returns:
+        BandStats, or None when the band had no valid pixels.
+    """
+    if not raw:
+        return None
+    count = raw.get(f'{band}_count')
+    if not count:
+        return None
+
+    prefix = f'{band}_p'
+    percentiles = {
+        int(key[len(prefix):]): value
+        for key, value in raw.items()
+        if key.startswith(prefix) and key[len(prefix):].isdigit() and value is not None
+    }
+
+    # fixedHistogram returns [[bin start, count], ...] with equal-width bins
+    rows = raw.get(f'{band}_histogram') or []
+    width = rows[1][0] - rows[0][0] if len(rows) > 1 else 0.0
+    histogram = [(start, start + width, int(pixels)) for start, pixels in rows]
+
+    return BandStats(
+        band=band,
+        count=int(count),
+        mean=raw.get(f'{band}_mean'),
+        std=raw.get(f'{band}_stdDev'),
+        min=raw.get(f'{band}_min'),
+        max=raw.get(f'{band}_max'),
+        percentiles=percentiles,
+        histogram=histogram
+    )
+
+
+# =============================================================================
+# Change Areas
+# =============================================================================
+
+CHANGE_CLASS_BAND = 'change_class'
+SQUARE_METERS_PER_HECTARE = 10000
+
+# Names for the default five classes, from the most negative difference up
+CHANGE_CLASS_NAMES = ('Strong loss', 'Moderate loss', 'No change', 'Moderate gain', 'Strong gain')
+
+
+def change_breaks(no_change: float, strong: float) -> Tuple[float, ...]:
+    """Symmetric class boundaries for the five default change classes."""
+    return (-strong, -no_change, no_change, strong)
+
+
+def change_class_labels(breaks: Sequence[float]) -> List[str]:
+    """
+    Label every class delimited by ``breaks``.
+
+    Classes are named when there are five of them; otherwise (and in
+    addition) they are described by their value range.
+    """
+    ranges = [f"< {breaks[0]:+.2f}"]
+    ranges += [f"{low:+.2f} to {high:+.2f}" for low, high in zip(breaks, breaks[1:])]
+    ranges.append(f"≥ {breaks[-1]:+.2f}")
+    if len(ranges) == len(CHANGE_CLASS_NAMES):
+        return [f"{name} ({r})" for name, r in zip(CHANGE_CLASS_NAMES, ranges)]
+    return ranges
+
+
+def classify_change(diff: ee.Image, breaks: Sequence[float]) -> ee.Image:
+    """
+    Class number of each pixel of a difference image.
+
+    Class 0 is below breaks[0], class i lies in [breaks[i-1], breaks[i]),
+    and the last class is at or above breaks[-1]. Masked pixels stay masked.
+    """
+    classes = diff.gte(breaks[0])
+    for value in breaks[1:]:
+        classes = classes.add(diff.gte(value))
+    return classes.toInt().rename(CHANGE_CLASS_BAND)
+
+
+def change_area_stats(
+    diff: ee.Image,
+    breaks: Sequence[float],
+    geometry: ee.Geometry,
+    scale: float
+) -> ee.List:
+    """
+    Build the per-class area reduction of a difference image.
+
+    Pixel areas in hectares are summed, grouped by change class, in a
+    single reduceRegion. No server call is made.
+
+    Args:
+        diff: Single-band difference image (later minus earlier)
+        breaks: Ascending class boundaries
+        geometry: Region to reduce over
+        scale: Pixel size in meters
+
+    Returns:
+        ee.List of {'class': int, 'sum': hectares} groups; see parse_change_areas.
+    """
+    classes = classify_change(diff, breaks)
+    area = (ee.Image.pixelArea()
+            .divide(SQUARE_METERS_PER_HECTARE)
+            .updateMask(classes.mask())
+            .addBands(classes))
+    return area.reduceRegion(
+        reducer=ee.Reducer.sum().group(groupField=1, groupName='class'),
+        geometry=geometry,
+        scale=scale,
+        maxPixels=1e9,
+        bestEffort=True
+    ).get('groups')
+
+
+def parse_change_areas(groups: Optional[list], breaks: Sequence[float]) -> List[Dict]:
+    """
+    One row per change class with its area and share of the valid area.
+
+    Classes without pixels are included with zero area, so tables and
+    charts always show every class.
+
+    Returns:
+        List of dicts with 'class', 'label', 'area_ha' and 'percent'.
+    """
+    areas = {int(g['class']): g['sum'] for g in groups or []}
+    total = sum(areas.values())
+    return [
+        {
+            'class': i,
+            'label': label,
+            'area_ha': areas.get(i, 0.0),
+            'percent': 100.0 * areas.get(i, 0.0) / total if total else 0.0,
+        }
+        for i, label in enumerate(change_class_labels(breaks))
+    ]
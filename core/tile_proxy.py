@@ -0,0 +1,430 @@
+"""
+AgriVision Pro V3 - Local Tile Proxy
+=====================================
+Optional caching proxy for map tiles (Earth Engine layers and basemaps).
+
+Folium maps fetch tiles straight from the browser, so users looking at
+the same area download identical tiles again and again. When enabled, the
+proxy runs on a background thread inside the app process. TileLayers point
+at it, and tiles are served from a disk-backed LRU cache, fetching from the
+upstream server only on a miss. Concurrent requests for the same missing
+tile are coalesced into one upstream fetch. ``/stats`` reports hit rates.
+
+The proxy also streams registered files (finished GeoTIFF exports) from
+disk under unguessable ``/files/<token>`` links, so a download never has
+to pass through Streamlit's in-memory media store.
+
+Configuration (environment):
+    AGRIVISION_TILE_PROXY             '1' to enable (default off)
+    AGRIVISION_TILE_PROXY_HOST        interface to bind (default 127.0.0.1; use
+                                      0.0.0.0 when browsers on other machines
+                                      connect to the proxy directly)
+    AGRIVISION_TILE_PROXY_PORT        listen port (default 8765, 0 = any free port)
+    AGRIVISION_TILE_PROXY_PUBLIC_URL  base URL browsers use to reach the proxy
+                                      (default http://localhost:<port>)
+    AGRIVISION_TILE_CACHE_MB          disk budget for cached tiles (default 512)
+
+If the proxy can't start (e.g. the port is taken), a warning is logged once
+and layers use their upstream URLs directly.
+
+The proxy only talks HTTP and never imports ``ee`` or Streamlit, so it can
+be exercised against a local stub tile server.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import secrets
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .stats_cache import CACHE_DIR
+
+
+TILE_CACHE_DIR = CACHE_DIR / 'tiles'
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_MAX_MB = 512
+UPSTREAM_TIMEOUT_SECONDS = 30
+
+# Registered layers are forgotten after the lifetime of an EE map ID, and
+# the least recently registered beyond the cap; maps re-register their
+# layers on every render
+LAYER_TTL_SECONDS = 24 * 3600
+MAX_LAYERS = 1024
+
+# Browsers may keep tiles for a while; EE tile URLs expire within a day anyway
+BROWSER_CACHE_SECONDS = 3600
+
+# Download links stay valid for a while after the export is offered; the
+# least recently registered beyond the cap are forgotten
+FILE_LINK_TTL_SECONDS = 3600
+MAX_FILES = 256
+FILE_CHUNK_BYTES = 1024 * 1024
+
+USER_AGENT = 'AgriVision-Pro tile proxy'
+
+logger = logging.getLogger(__name__)
+
+
+def _sniff_content_type(data: bytes) -> str:
+    """Guess a tile's MIME type from its magic bytes."""
+    if data.startswith(b'\x89PNG'):
+        return 'image/png'
+    if data.startswith(b'\xff\xd8'):
+        return 'image/jpeg'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'application/octet-stream'
+
+
+# =============================================================================
+# Disk Tile Store
+# =============================================================================
+
+class TileStore:
+    """Directory of tiles with an in-memory LRU index and a disk budget."""
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index: 'OrderedDict[str, int]' = OrderedDict()
+        self._total = 0
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        # Rebuild the index from disk, oldest first
+        files = sorted(self.directory.glob('*.tile'), key=lambda p: p.stat().st_mtime)
+        for path in files:
+            size = path.stat().st_size
+            self._index[path.stem] = size
+            self._total += size
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.tile"
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return a cached tile and mark it recently used, or None."""
+        with self._lock:
+            if key not in self._index:
+                return None
+            self._index.move_to_end(key)
+        try:
+            return self._path(key).read_bytes()
+        except OSError:
+            with self._lock:
+                self._total -= self._index.pop(key, 0)
+            return None
+
+    def put(self, key: str, data: bytes) -> None:
+        """Store a tile, then evict least recently used tiles over budget."""
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._total += len(data) - self._index.pop(key, 0)
+            self._index[key] = len(data)
+            while self._total > self.max_bytes and len(self._index) > 1:
+                old_key, size = self._index.popitem(last=False)
+                self._total -= size
+                try:
+                    self._path(old_key).unlink()
+                except OSError:
+                    pass
+
+    def usage(self) -> Tuple[int, int]:
+        """(tile count, bytes) currently cached."""
+        with self._lock:
+            return len(self._index), self._total
+
+
+class _Inflight:
+    """An upstream fetch other requesters can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[Tuple[int, bytes]] = None
+
+
+# =============================================================================
+# Proxy Server
+# =============================================================================
+
+class TileProxy:
+    """Caching HTTP tile proxy running on a background thread."""
+
+    def __init__(
+        self,
+        port: int = DEFAULT_PORT,
+        cache_dir: Path = TILE_CACHE_DIR,
+        max_mb: int = DEFAULT_MAX_MB,
+        public_url: Optional[str] = None,
+        host: str = DEFAULT_HOST
+    ):
+        self.store = TileStore(cache_dir, max_mb * 1024 * 1024)
+        # layer id -> (expiry time, upstream template), least recently registered first
+        self._layers: 'OrderedDict[str, Tuple[float, str]]' = OrderedDict()
+        # file token -> (expiry time, path, download file name)
+        self._files: 'OrderedDict[str, Tuple[float, str, str]]' = OrderedDict()
+        self._inflight: Dict[str, _Inflight] = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'errors': 0, 'upstream_bytes': 0}
+
+        self._session = requests.Session()
+        self._session.headers['User-Agent'] = USER_AGENT
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=32)
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self.public_url = (public_url or f"http://localhost:{self.port}").rstrip('/')
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> 'TileProxy':
+        """Serve requests on a daemon thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name='tile-proxy', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and close the listening socket."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def register(self, url_template: str) -> str:
+        """
+        Register an upstream XYZ template and return its proxied template.
+
+        Args:
+            url_template: Upstream URL containing {z}, {x} and {y}
+
+        Returns:
+            URL template on this proxy, for a folium TileLayer.
+        """
+        layer_id = hashlib.sha256(url_template.encode('utf-8')).hexdigest()[:16]
+        now = time.time()
+        with self._lock:
+            self._layers.pop(layer_id, None)
+            self._layers[layer_id] = (now + LAYER_TTL_SECONDS, url_template)
+            while self._layers and (len(self._layers) > MAX_LAYERS
+                                    or next(iter(self._layers.values()))[0] <= now):
+                self._layers.popitem(last=False)
+        return f"{self.public_url}/tiles/{layer_id}/{{z}}/{{x}}/{{y}}"
+
+    def register_file(self, path: str, file_name: str) -> str:
+        """
+        Register a file on disk and return a URL that streams it as a download.
+
+        The file is read when the link is followed, in chunks, so serving
+        it costs no memory beyond one chunk.
+        """
+        token = secrets.token_urlsafe(16)
+        now = time.time()
+        with self._lock:
+            self._files[token] = (now + FILE_LINK_TTL_SECONDS, str(path), file_name)
+            while self._files and (len(self._files) > MAX_FILES
+                                   or next(iter(self._files.values()))[0] <= now):
+                self._files.popitem(last=False)
+        return f"{self.public_url}/files/{token}"
+
+    def get_file(self, token: str) -> Optional[Tuple[str, str]]:
+        """(path, download file name) for a registered, unexpired file, or None."""
+        with self._lock:
+            entry = self._files.get(token)
+        if entry is None or entry[0] <= time.time():
+            return None
+        return entry[1], entry[2]
+
+    def stats(self) -> Dict:
+        """
+        Request counters, hit rate and cache usage.
+
+        ``hit_rate`` is the share of tile requests answered without their
+        own upstream fetch (cache hits plus coalesced duplicates).
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['layers'] = len(self._layers)
+        lookups = stats['hits'] + stats['misses'] + stats['coalesced']
+        served = stats['hits'] + stats['coalesced']
+        stats['hit_rate'] = round(served / lookups, 4) if lookups else 0.0
+        stats['cached_tiles'], stats['cached_bytes'] = self.store.usage()
+        return stats
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[name] += amount
+
+    def get_tile(self, layer_id: str, z: int, x: int, y: int) -> Tuple[int, bytes]:
+        """
+        Return (HTTP status, body) for one tile, from cache or upstream.
+
+        Only the first request for a missing tile goes upstream; concurrent
+        requests for the same tile wait for its result.
+        """
+        with self._lock:
+            entry = self._layers.get(layer_id)
+        if entry is None or entry[0] <= time.time():
+            return 404, b'Unknown layer'
+        template = entry[1]
+
+        key = hashlib.sha256(f"{template}|{z}|{x}|{y}".encode('utf-8')).hexdigest()
+        data = self.store.get(key)
+        if data is not None:
+            self._count('hits')
+            return 200, data
+
+        with self._lock:
+            inflight = self._inflight.get(key)
+            leader = inflight is None
+            if leader:
+                inflight = self._inflight[key] = _Inflight()
+
+        if not leader:
+            self._count('coalesced')
+            inflight.done.wait(UPSTREAM_TIMEOUT_SECONDS + 5)
+            return inflight.result or (504, b'Upstream timeout')
+
+        self._count('misses')
+        try:
+            inflight.result = self._fetch_upstream(template.format(z=z, x=x, y=y), key)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            inflight.done.set()
+        return inflight.result
+
+    def _fetch_upstream(self, url: str, key: str) -> Tuple[int, bytes]:
+        try:
+            response = self._session.get(url, timeout=UPSTREAM_TIMEOUT_SECONDS)
+        except requests.RequestException as e:
+            self._count('errors')
+            return 502, str(e).encode('utf-8')
+
+        if response.status_code != 200:
+            self._count('errors')
+            return response.status_code, response.content
+
+        self._count('upstream_bytes', len(response.content))
+        self.store.put(key, response.content)
+        return 200, response.content
+
+    def _make_handler(self):
+        proxy = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parts = self.path.split('?', 1)[0].strip('/').split('/')
+                if parts == ['stats']:
+                    self._send(200, json.dumps(proxy.stats()).encode('utf-8'),
+                               'application/json')
+                    return
+                if len(parts) == 5 and parts[0] == 'tiles':
+                    try:
+                        z, x, y = (int(p) for p in parts[2:])
+                    except ValueError:
+                        self._send(400, b'Bad tile address', 'text/plain')
+                        return
+                    status, body = proxy.get_tile(parts[1], z, x, y)
+                    if status == 200:
+                        self._send(200, body, _sniff_content_type(body), cacheable=True)
+                    else:
+                        self._send(status, body, 'text/plain')
+                    return
+                if len(parts) == 2 and parts[0] == 'files':
+                    self._send_file(proxy.get_file(parts[1]))
+                    return
+                self._send(404, b'Not found', 'text/plain')
+
+            def _send_file(self, entry):
+                try:
+                    f = open(entry[0], 'rb') if entry else None
+                except OSError:
+                    f = None  # Evicted from the raster cache since it was offered
+                if f is None:
+                    self._send(404, b'File not found or link expired', 'text/plain')
+                    return
+                with f:
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/octet-stream')
+                    self.send_header('Content-Length', str(os.fstat(f.fileno()).st_size))
+                    self.send_header('Content-Disposition',
+                                     f'attachment; filename="{entry[1]}"')
+                    self.end_headers()
+                    shutil.copyfileobj(f, self.wfile, FILE_CHUNK_BYTES)
+
+            def _send(self, status, body, content_type, cacheable=False):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('Access-Control-Allow-Origin', '*')
+                if cacheable:
+                    self.send_header('Cache-Control', f'public, max-age={BROWSER_CACHE_SECONDS}')
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Tile requests would flood the app log
+
+        return Handler
+
+
+# =============================================================================
+# Shared Instance
+# =============================================================================
+
+_shared_proxy: Optional[TileProxy] = None
+_shared_failed = False
+_shared_lock = threading.Lock()
+
+
+def tile_proxy_enabled() -> bool:
+    """Return True if the tile proxy is switched on in the environment."""
+    return os.environ.get('AGRIVISION_TILE_PROXY', '').lower() in ('1', 'true', 'yes', 'on')
+
+
+def get_tile_proxy() -> Optional[TileProxy]:
+    """
+    Return the running process-wide proxy, starting it on first use.
+
+    Returns None when the proxy is disabled or failed to start; a start
+    failure is logged once and not retried.
+    """
+    global _shared_proxy, _shared_failed
+    if not tile_proxy_enabled():
+        return None
+    with _shared_lock:
+        if _shared_proxy is None and not _shared_failed:
+            try:
+                _shared_proxy = TileProxy(
+                    host=os.environ.get('AGRIVISION_TILE_PROXY_HOST', DEFAULT_HOST),
+                    port=int(os.environ.get('AGRIVISION_TILE_PROXY_PORT', DEFAULT_PORT)),
+                    max_mb=int(os.environ.get('AGRIVISION_TILE_CACHE_MB', DEFAULT_MAX_MB)),
+                    public_url=os.environ.get('AGRIVISION_TILE_PROXY_PUBLIC_URL')
+                ).start()
+            except OSError as e:
+                _shared_failed = True
+                logger.warning("Tile proxy could not start (%s); serving tiles directly", e)
+        return _shared_proxy
+
+
+def proxied_tile_url(url_template: str) -> str:
+    """Route an XYZ template through the proxy when enabled, else return it as is."""
+    proxy = get_tile_proxy()
+    if proxy is None:
+        return url_template
+    return proxy.register(url_template)
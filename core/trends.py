@@ -0,0 +1,42 @@
+"""
+AgriVision Pro V3 - Trend Utilities
+====================================
+Vectorized trend fitting for many series at once.
+"""
+
+import numpy as np
+
+
+def linear_trend_slopes(values: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """
+    Least-squares slope of every row of ``values`` against ``x``.
+
+    Missing observations (NaN) are ignored per row, so fields observed on
+    different dates can share one matrix. Rows with fewer than 3 valid
+    points get NaN.
+
+    Args:
+        values: Array of shape (n_series, n_times)
+        x: Array of shape (n_times,), e.g. days since the first acquisition
+
+    Returns:
+        Array of shape (n_series,) with slopes in value units per x unit
+    """
+    values = np.asarray(values, dtype=float)
+    x = np.broadcast_to(np.asarray(x, dtype=float), values.shape)
+
+    valid = ~np.isnan(values)
+    n = valid.sum(axis=1)
+
+    x_valid = np.where(valid, x, 0.0)
+    y_valid = np.where(valid, values, 0.0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x_mean = x_valid.sum(axis=1) / n
+        y_mean = y_valid.sum(axis=1) / n
+        dx = np.where(valid, x - x_mean[:, None], 0.0)
+        dy = np.where(valid, values - y_mean[:, None], 0.0)
+        slopes = (dx * dy).sum(axis=1) / (dx * dx).sum(axis=1)
+
+    slopes[n < 3] = np.nan
+    return slopes
@@ -5,56 +5,24 @@ Calculate vegetation indices from satellite imagery.
 """
 
 import ee
-from typing import Dict, Tuple
+from typing import Dict, List, Tuple
+
+from .index_registry import compile_ee, list_indices
 
 
 # =============================================================================
 # Index Definitions
 # =============================================================================
 
+# Satellite indices, as defined in the shared index registry
 VEGETATION_INDICES = {
-    "NDVI": {
-        "name": "Normalized Difference Vegetation Index",
-        "description": "Most common vegetation index. Values: -1 to 1 (healthy vegetation > 0.3)",
-        "formula": "(NIR - Red) / (NIR + Red)",
-        "range": (-1, 1)
-    },
-    "EVI": {
-        "name": "Enhanced Vegetation Index",
-        "description": "Improved sensitivity in high biomass areas.",
-        "formula": "2.5 * (NIR - Red) / (NIR + 6*Red - 7.5*Blue + 1)",
-        "range": (-1, 1)
-    },
-    "SAVI": {
-        "name": "Soil Adjusted Vegetation Index",
-        "description": "Minimizes soil brightness influences.",
-        "formula": "1.5 * (NIR - Red) / (NIR + Red + 0.5)",
-        "range": (-1.5, 1.5)
-    },
-    "NDWI": {
-        "name": "Normalized Difference Water Index",
-        "description": "Detects water content in vegetation.",
-        "formula": "(Green - NIR) / (Green + NIR)",
-        "range": (-1, 1)
-    },
-    "NDMI": {
-        "name": "Normalized Difference Moisture Index",
-        "description": "Sensitive to moisture levels in vegetation canopy.",
-        "formula": "(NIR - SWIR1) / (NIR + SWIR1)",
-        "range": (-1, 1)
-    },
-    "GNDVI": {
-        "name": "Green NDVI",
-        "description": "Sensitive to chlorophyll concentration.",
-        "formula": "(NIR - Green) / (NIR + Green)",
-        "range": (-1, 1)
-    },
-    "NBR": {
-        "name": "Normalized Burn Ratio",
-        "description": "Detects burned areas and fire severity.",
-        "formula": "(NIR - SWIR2) / (NIR + SWIR2)",
-        "range": (-1, 1)
+    key: {
+        "name": d.name,
+        "description": d.description,
+        "formula": d.expression,
+        "range": d.range
     }
+    for key, d in list_indices(family='multispectral').items()
 }
 
 
@@ -64,51 +32,37 @@ VEGETATION_INDICES = {
 
 def calculate_ndvi(image: ee.Image) -> ee.Image:
     """Calculate NDVI."""
-    return image.normalizedDifference(['nir', 'red']).rename('NDVI')
+    return compile_ee('NDVI')(image)
 
 
 def calculate_evi(image: ee.Image) -> ee.Image:
     """Calculate EVI."""
-    return image.expression(
-        '2.5 * (NIR - RED) / (NIR + 6 * RED - 7.5 * BLUE + 1)',
-        {
-            'NIR': image.select('nir'),
-            'RED': image.select('red'),
-            'BLUE': image.select('blue')
-        }
-    ).rename('EVI')
+    return compile_ee('EVI')(image)
 
 
 def calculate_savi(image: ee.Image, L: float = 0.5) -> ee.Image:
     """Calculate SAVI with adjustable L factor."""
-    return image.expression(
-        '(1 + L) * (NIR - RED) / (NIR + RED + L)',
-        {
-            'NIR': image.select('nir'),
-            'RED': image.select('red'),
-            'L': L
-        }
-    ).rename('SAVI')
+    return compile_ee('SAVI', L=L)(image)
 
 
 def calculate_ndwi(image: ee.Image) -> ee.Image:
     """Calculate NDWI."""
-    return image.normalizedDifference(['green', 'nir']).rename('NDWI')
+    return compile_ee('NDWI')(image)
 
 
 def calculate_ndmi(image: ee.Image) -> ee.Image:
     """Calculate NDMI."""
-    return image.normalizedDifference(['nir', 'swir1']).rename('NDMI')
+    return compile_ee('NDMI')(image)
 
 
 def calculate_gndvi(image: ee.Image) -> ee.Image:
     """Calculate Green NDVI."""
-    return image.normalizedDifference(['nir', 'green']).rename('GNDVI')
+    return compile_ee('GNDVI')(image)
 
 
 def calculate_nbr(image: ee.Image) -> ee.Image:
     """Calculate Normalized Burn Ratio."""
-    return image.normalizedDifference(['nir', 'swir2']).rename('NBR')
+    return compile_ee('NBR')(image)
 
 
 # =============================================================================
@@ -124,22 +78,21 @@ def calculate_index(image: ee.Image, index_name: str, sensor: str = None) -> ee.
         elif index_name == "EVI":
             return image.select('evi').rename('EVI')
     
-    calculators = {
-        'NDVI': calculate_ndvi,
-        'EVI': calculate_evi,
-        'SAVI': calculate_savi,
-        'NDWI': calculate_ndwi,
-        'NDMI': calculate_ndmi,
-        'GNDVI': calculate_gndvi,
-        'NBR': calculate_nbr
-    }
-    
-    calculator = calculators.get(index_name, calculate_ndvi)
-    return calculator(image)
+    if index_name not in VEGETATION_INDICES:
+        index_name = 'NDVI'
+    return compile_ee(index_name)(image)
+
+
+def calculate_indices(image: ee.Image, index_names: List[str], sensor: str = None) -> ee.Image:
+    """Calculate several indices as bands of one image, named after each index."""
+    return ee.Image.cat([calculate_index(image, name, sensor) for name in index_names])
 
 
 def get_available_indices(sensor: str = None) -> Dict:
     """Get available indices, optionally filtered by sensor capability."""
+    if sensor == "MODIS":
+        # MODIS products only carry the precomputed NDVI/EVI bands
+        return {k: v for k, v in VEGETATION_INDICES.items() if k in ("NDVI", "EVI")}
     return VEGETATION_INDICES
 
 
@@ -32,11 +32,16 @@ st.set_page_config(
 import ee
 from datetime import datetime, timedelta
 import json
+import os
+import time
+import pandas as pd
+import plotly.graph_objects as go
 
 # Import app components
 from app_components.auth_component import ensure_ee_initialized
 from app_components.aoi_component import AOIComponent
 from app_components.time_series import TimeSeriesComponent
+from app_components.field_batch import FieldBatchComponent
 from app_components.visitor_stats import VisitorStatsComponent
 from app_components.contact_form import ContactFormComponent
 from app_components.theme_utils import apply_theme_css
@@ -49,10 +54,27 @@ from core.satellite_data import (
     get_image_list, get_single_image
 )
 from core.vegetation_indices import (
-    calculate_index, get_available_indices, get_index_vis_params
+    calculate_index, calculate_indices, get_available_indices, get_index_vis_params
 )
-from core.map_utils import display_ee_map
-from core.download_utils import download_ee_image_bytes
+from core.map_utils import display_ee_map, display_preview_map, get_tile_url
+from core.download_utils import (
+    download_ee_image_file, download_ee_image_tiled,
+    estimate_download_bytes, new_download_path, plan_download
+)
+from core.geometry_utils import geojson_bbox, geometry_fingerprint
+from core.raster_cache import get_raster_cache, image_fingerprint, raster_cache_key
+from core.ee_executor import get_executor
+from core.ee_bundle import evaluate_bundle
+from core.index_registry import (
+    evaluate_numpy, get_index_definition, list_indices, prepare_bands
+)
+from core.download_jobs import get_download_jobs
+from core.image_processing import RGB_CHANNELS
+from core.tile_proxy import get_tile_proxy
+from core.stats_engine import (
+    change_area_stats, change_breaks, parse_band_stats, parse_change_areas, region_stats
+)
+from core.extraction import build_fields_collection
 
 # Apply theme CSS
 apply_theme_css()
@@ -213,6 +235,7 @@ def render_satellite_analysis():
     st.markdown('<div class="step-header"><strong>Step 1:</strong> Select Area of Interest</div>', unsafe_allow_html=True)
     aoi_component = AOIComponent(session_prefix="sat_")
     aoi = aoi_component.render()
+    aoi_info = aoi_component.get_aoi_info()
     
     if aoi is None:
         st.info("👆 Please select and confirm an area of interest to continue")
@@ -231,9 +254,7 @@ def render_satellite_analysis():
         )
     
     with col2:
-        indices = list(get_available_indices().keys())
-        if sensor == "MODIS":
-            indices = ["NDVI", "EVI"]  # MODIS has built-in indices
+        indices = list(get_available_indices(sensor).keys())  # MODIS has built-in NDVI/EVI only
         selected_index = st.selectbox("📊 Vegetation Index:", indices, key="sat_index")
     
     with col3:
@@ -280,12 +301,38 @@ def render_satellite_analysis():
         key="sat_composite"
     )
     
+    all_indices = st.checkbox(
+        "⚡ Compute all indices at once",
+        help="Builds every index as a band of one composite, with one statistics request. "
+             "Switching the index afterwards reuses them instead of regenerating the map.",
+        key="sat_all_indices"
+    )
+    
+    # Everything that identifies the composite, apart from the displayed index
+    settings = (sensor, str(start_date), str(end_date), max_cloud, user_scale, composite_type,
+                geometry_fingerprint(aoi_info['geojson'] if aoi_info else aoi))
+    
     # Generate button
     if st.button("🗺️ Generate Vegetation Map", type="primary", key="sat_generate"):
         _generate_vegetation_map(
             aoi, sensor, selected_index, str(start_date), str(end_date),
-            max_cloud, user_scale, composite_type
+            max_cloud, user_scale, composite_type, aoi_info,
+            all_indices=all_indices, settings=settings
         )
+    elif st.session_state.get('sat_map_result'):
+        # Keep the last map (and its download) on screen across reruns, as
+        # long as it still matches the selected parameters
+        result = st.session_state['sat_map_result']
+        if (result['settings'] != settings
+                or (result['index_name'] != selected_index
+                    and selected_index not in result['band_names'])):
+            st.info("ℹ️ Parameters changed — click **Generate Vegetation Map** to update the map.")
+        else:
+            if result['index_name'] != selected_index:
+                # All-indices composite: the new index is already one of its bands
+                result = _select_index_layer(result, selected_index)
+                st.session_state['sat_map_result'] = result
+            _render_vegetation_map(result)
     
     # Time Series Section
     st.markdown("---")
@@ -297,14 +344,46 @@ def render_satellite_analysis():
         
         if images:
             ts_component = TimeSeriesComponent(session_prefix="sat_")
-            ts_component.render(aoi, images, sensor, selected_index)
+            ts_component.render(
+                aoi, images, sensor, selected_index,
+                end_date=str(end_date), max_cloud=max_cloud, start_date=str(start_date)
+            )
         else:
             st.warning("No images found for time series analysis")
+    
+    # Multi-field batch (only when a multi-feature GeoJSON was uploaded)
+    fields = aoi_component.get_fields()
+    if fields and st.checkbox(f"🌾 Multi-Field Batch Analysis ({len(fields)} fields)", key="sat_fields_enable"):
+        fields_region = build_fields_collection(fields).geometry().bounds()
+        with st.spinner("Loading available images..."):
+            field_images = get_image_list(sensor, str(start_date), str(end_date), fields_region, max_cloud)
+        
+        if field_images:
+            field_component = FieldBatchComponent(session_prefix="sat_")
+            field_component.render(fields, field_images, sensor, selected_index)
+        else:
+            st.warning("No images found for the uploaded fields")
+
+
+# Longest edge, in pixels, of the quick preview thumbnail
+PREVIEW_DIMENSIONS = 512
+
+# The metadata request reduces the whole composite; allow more than a single call
+MAP_TIMEOUT_SECONDS = 300
 
 
 def _generate_vegetation_map(aoi, sensor, index_name, start_date, end_date, 
-                              max_cloud, scale, composite_type):
-    """Generate and display vegetation map."""
+                              max_cloud, scale, composite_type, aoi_info=None,
+                              all_indices=False, settings=None):
+    """
+    Generate and display vegetation map.
+    
+    With ``all_indices``, every index for the sensor is computed as a band
+    of one image and stretched from a single percentile reduction, so other
+    indices can later be shown with _select_index_layer.
+    """
+    st.session_state.pop('sat_map_result', None)
+    map_placeholder = None
     
     with st.spinner(f"Generating {index_name} map..."):
         try:
@@ -318,105 +397,421 @@ def _generate_vegetation_map(aoi, sensor, index_name, start_date, end_date,
             else:
                 collection = get_modis_collection(start_date, end_date, aoi, max_cloud)
             
-            # Check collection size
-            count = collection.size().getInfo()
-            if count == 0:
-                st.error("❌ No images found. Try a different date range or cloud threshold.")
-                return
-            
-            st.info(f"📷 Found {count} images")
-            
             # Create composite
             if composite_type == "Median Composite":
                 image = collection.median().clip(aoi)
-                title = f"{index_name} (Median Composite)"
+                composite_label = "Median Composite"
             elif composite_type == "Mean Composite":
                 image = collection.mean().clip(aoi)
-                title = f"{index_name} (Mean Composite)"
+                composite_label = "Mean Composite"
             else:
                 image = collection.first().clip(aoi)
-                title = f"{index_name} (Single Image)"
-            
-            # Calculate index
-            index_image = calculate_index(image, index_name, sensor)
-            band_name = index_image.bandNames().getInfo()[0]
+                composite_label = "Single Image"
+            title = f"{index_name} ({composite_label})"
             
-            # Get default vis params
-            default_vmin, default_vmax, palette = get_index_vis_params(index_name)
-            vmin, vmax = default_vmin, default_vmax
+            # Calculate index (bands are always named after their index); the
+            # map layer picks its band through the 'bands' vis param
+            if all_indices:
+                band_names = list(get_available_indices(sensor).keys())
+                layer_image = calculate_indices(image, band_names, sensor)
+                index_image = layer_image.select(index_name)
+            else:
+                band_names = [index_name]
+                layer_image = index_image = calculate_index(image, index_name, sensor)
             
-            # Try to calculate stats (silent fallback)
-            try:
-                stats = index_image.reduceRegion(
-                    reducer=ee.Reducer.percentile([5, 95]),
-                    geometry=aoi,
-                    scale=scale,
-                    maxPixels=1e9,
-                    bestEffort=True
-                ).getInfo()
-                
-                vmin_raw = stats.get(f'{band_name}_p5')
-                vmax_raw = stats.get(f'{band_name}_p95')
-                
-                if vmin_raw is not None and vmax_raw is not None:
-                    vmin = vmin_raw
-                    vmax = vmax_raw
-            except Exception:
-                pass  # Silent fallback to defaults
-            
-            vis_params = {
-                'bands': [band_name],
-                'min': vmin,
-                'max': vmax,
-                'palette': palette
+            # Image count and region statistics (stretch percentiles, mean, std,
+            # min/max, pixel count, histogram) in one round trip; stats are
+            # optional and fall back to defaults. The AOI outline and centroid
+            # come from the AOI component when it has them client-side.
+            required = {'count': collection.size()}
+            if aoi_info is None:
+                required['centroid'] = aoi.centroid().coordinates()
+                required['aoi'] = aoi
+            optional = {
+                # One combined reducer covers every statistic of every band
+                'stats': region_stats(layer_image, band_names, aoi, scale),
             }
             
-            # Get center
-            try:
-                centroid = aoi.centroid().getInfo()['coordinates']
-                center = [centroid[1], centroid[0]]
-            except Exception:
-                center = [39.0, -98.0]
+            def fetch_full_layer():
+                # Metadata, then the tile layer registration (warms the tile URL cache)
+                metadata = evaluate_bundle(required, optional)
+                if metadata['count']:
+                    get_tile_url(layer_image, _stretch_vis_params(index_name, metadata['stats']))
+                return metadata
             
-            # Display map
-            display_ee_map(
-                center=center,
-                zoom=12,
-                ee_image=index_image,
-                vis_params=vis_params,
-                layer_name=title,
-                aoi=aoi,
-                height=500
-            )
-            
-            st.success(f"✅ {index_name} map generated! (Resolution: {scale}m)")
-            st.markdown(f"**Legend:** 🔴 Low ({vmin:.2f}) → 🟡 Moderate → 🟢 High ({vmax:.2f})")
+            calls = {'layer': fetch_full_layer}
+            if aoi_info is not None:
+                # A small thumbnail with default stretch renders long before the layer
+                min_lon, min_lat, max_lon, max_lat = aoi_info['bbox']
+                preview_vis = _stretch_vis_params(index_name, None)
+                calls['preview'] = lambda: layer_image.getThumbURL({
+                    **preview_vis,
+                    'region': ee.Geometry.Rectangle([min_lon, min_lat, max_lon, max_lat]),
+                    'dimensions': PREVIEW_DIMENSIONS,
+                    'format': 'png',
+                })
             
-            # Download option
-            with st.expander("📥 Download Options"):
-                if st.button("Prepare Download", key="sat_download"):
-                    with st.spinner("Preparing GeoTIFF..."):
-                        data, used_scale = download_ee_image_bytes(
-                            index_image, aoi, scale, f"{index_name}_map"
+            # Both requests in flight at once; show the preview as soon as it lands
+            map_placeholder = st.empty()
+            metadata = None
+            for task in get_executor().map_unordered(lambda name: calls[name](), list(calls),
+                                                     timeout=MAP_TIMEOUT_SECONDS):
+                if task.key == 'layer':
+                    if not task.ok:
+                        raise task.error
+                    metadata = task.value
+                elif task.ok and metadata is None:
+                    centroid = aoi_info['centroid']
+                    with map_placeholder.container():
+                        display_preview_map(
+                            center=[centroid[1], centroid[0]], zoom=12,
+                            thumb_url=task.value, bbox=aoi_info['bbox'],
+                            aoi_geojson=aoi_info['geojson'], height=500,
+                            key="sat_preview_map"
                         )
-                    if data:
-                        if used_scale != scale:
-                            st.info(
-                                f"ℹ️ Resolution automatically adjusted to {used_scale}m "
-                                f"to fit the download size limit."
-                            )
-                        st.download_button(
-                            "📥 Download GeoTIFF",
-                            data=data,
-                            file_name=f"{index_name}_map.tif",
-                            mime="image/tiff",
-                            key="sat_download_btn"
-                        )
-                    else:
-                        st.error("❌ Download failed. Try a smaller area or coarser resolution.")
+            
+            count = metadata['count']
+            if count == 0:
+                map_placeholder.empty()
+                st.error("❌ No images found. Try a different date range or cloud threshold.")
+                return
+            
+            st.info(f"📷 Found {count} images")
+            
+            vis_params = _stretch_vis_params(index_name, metadata['stats'])
+            
+            # Get center
+            if aoi_info is not None:
+                aoi_geojson, centroid = aoi_info['geojson'], aoi_info['centroid']
+            else:
+                aoi_geojson, centroid = metadata['aoi'], metadata['centroid']
+            center = [centroid[1], centroid[0]] if centroid else [39.0, -98.0]
+            
+            result = {
+                'index_name': index_name,
+                'index_image': index_image,
+                'layer_image': layer_image,
+                'band_names': band_names,
+                'stats': metadata['stats'],
+                'settings': settings,
+                'composite_label': composite_label,
+                'aoi': aoi,
+                'aoi_geojson': aoi_geojson,
+                'center': center,
+                'vis_params': vis_params,
+                'title': title,
+                'scale': scale,
+                # Client-side fingerprints identifying this export in the raster cache
+                'image_fp': image_fingerprint(index_image),
+                'aoi_fp': geometry_fingerprint(aoi_geojson),
+                # Composite kept for the all-indices stacked export
+                'composite': image,
+                'sensor': sensor,
+            }
+            if all_indices:
+                # Same graph the stacked export would build
+                result['stack_image'] = layer_image
+                result['stack_fp'] = image_fingerprint(layer_image)
+            st.session_state['sat_map_result'] = result
             
         except Exception as e:
+            if map_placeholder is not None:
+                map_placeholder.empty()  # Don't leave a preview that will never load
             st.error(f"❌ Error: {str(e)}")
+            return
+    
+    # The full map replaces the preview in place
+    with map_placeholder.container():
+        _render_vegetation_map(result)
+
+
+def _stretch_vis_params(index_name, stats):
+    """Vis params stretched to the 5th-95th percentiles, or index defaults."""
+    vmin, vmax, palette = get_index_vis_params(index_name)
+    
+    stats = stats or {}
+    vmin_raw = stats.get(f'{index_name}_p5')
+    vmax_raw = stats.get(f'{index_name}_p95')
+    if vmin_raw is not None and vmax_raw is not None:
+        vmin, vmax = vmin_raw, vmax_raw
+    
+    return {
+        'bands': [index_name],
+        'min': vmin,
+        'max': vmax,
+        'palette': palette
+    }
+
+
+def _select_index_layer(result, index_name):
+    """
+    Switch an all-indices map result to another of its bands.
+    
+    Client-side only: the composite and the stretch percentiles are reused,
+    and the map layer differs only in its 'bands' vis param.
+    """
+    index_image = result['layer_image'].select(index_name)
+    return {
+        **result,
+        'index_name': index_name,
+        'index_image': index_image,
+        'vis_params': _stretch_vis_params(index_name, result['stats']),
+        'title': f"{index_name} ({result['composite_label']})",
+        'image_fp': image_fingerprint(index_image),
+    }
+
+
+def _render_vegetation_map(result):
+    """Display a generated vegetation map with its legend and download options."""
+    index_name = result['index_name']
+    vis_params = result['vis_params']
+    scale = result['scale']
+    
+    try:
+        # Display map
+        display_ee_map(
+            center=result['center'],
+            zoom=12,
+            ee_image=result['layer_image'],
+            vis_params=vis_params,
+            layer_name=result['title'],
+            aoi=result['aoi'],
+            aoi_geojson=result['aoi_geojson'],
+            height=500
+        )
+        
+        st.success(f"✅ {index_name} map generated! (Resolution: {scale}m)")
+        st.markdown(f"**Legend:** 🔴 Low ({vis_params['min']:.2f}) → 🟡 Moderate → 🟢 High ({vis_params['max']:.2f})")
+        
+        _render_stats_panel(parse_band_stats(result['stats'], index_name))
+        
+        # Download option
+        with st.expander("📥 Download Options"):
+            _render_download_options(result)
+        
+    except Exception as e:
+        st.error(f"❌ Error: {str(e)}")
+
+
+def _render_stats_panel(stats):
+    """Summary metrics and histogram of the displayed index over the AOI."""
+    if stats is None:
+        st.caption("ℹ️ Region statistics unavailable for this map")
+        return
+    
+    def fmt(value):
+        return "—" if value is None else f"{value:.3f}"
+    
+    with st.expander(f"📊 {stats.band} Statistics", expanded=True):
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Mean", fmt(stats.mean))
+        col2.metric("Median", fmt(stats.median))
+        col3.metric("Std Dev", fmt(stats.std))
+        col4.metric("Pixels", f"{stats.count:,}")
+        
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Min", fmt(stats.min))
+        col2.metric("P5", fmt(stats.percentiles.get(5)))
+        col3.metric("P95", fmt(stats.percentiles.get(95)))
+        col4.metric("Max", fmt(stats.max))
+        
+        if stats.histogram:
+            starts, ends, counts = zip(*stats.histogram)
+            fig = go.Figure(go.Bar(
+                x=[(a + b) / 2 for a, b in zip(starts, ends)],
+                y=counts,
+                width=[b - a for a, b in zip(starts, ends)],
+                marker_color='#2E7D32',
+                hovertemplate='%{x:.3f}: %{y:,} pixels<extra></extra>'
+            ))
+            fig.update_layout(
+                xaxis_title=stats.band,
+                yaxis_title="Pixels",
+                height=280,
+                margin=dict(l=10, r=10, t=10, b=10),
+                bargap=0.05,
+                template='plotly_white'
+            )
+            st.plotly_chart(fig, use_container_width=True)
+
+
+def _render_download_options(result):
+    """Prepare and offer the GeoTIFF export of a generated map."""
+    index_name = result['index_name']
+    scale = result['scale']
+    
+    content = st.radio(
+        "Export content:",
+        [f"{index_name} only", "All indices (stacked)"],
+        horizontal=True,
+        help="The stacked export holds one band per vegetation index, from the same composite",
+        key="sat_download_content"
+    )
+    if content == "All indices (stacked)":
+        band_names = list(get_available_indices(result['sensor']).keys())
+        if 'stack_image' not in result:
+            # Built client-side from the stored composite; no server call
+            result['stack_image'] = calculate_indices(result['composite'], band_names, result['sensor'])
+            result['stack_fp'] = image_fingerprint(result['stack_image'])
+        export_image, export_fp = result['stack_image'], result['stack_fp']
+        file_name = "vegetation_indices_stack.tif"
+    else:
+        band_names = [index_name]
+        export_image, export_fp = result['index_image'], result['image_fp']
+        file_name = f"{index_name}_map.tif"
+    bands = len(band_names)
+    
+    export_mode = st.radio(
+        "Export mode:",
+        ["Full resolution (tiled)", "Single file (coarsen if too large)"],
+        horizontal=True,
+        help="Tiled exports keep the requested resolution by downloading the area in pieces",
+        key="sat_download_mode"
+    )
+    
+    compact = st.checkbox(
+        "Compact int16 values",
+        value=True,
+        help="Stores index × 10000 as int16 with the scale factor in the file metadata. "
+             "Halves the size, so more pixels fit per request.",
+        key="sat_download_int16"
+    )
+    dtype = 'int16' if compact else 'float32'
+    
+    bbox = geojson_bbox(result['aoi_geojson'])
+    plan = plan_download(bbox, scale, bands=bands, dtype=dtype)
+    
+    size_mb = plan.estimated_bytes / 1e6
+    if export_mode == "Full resolution (tiled)":
+        tiles = "1 request" if plan.tile_count == 1 else f"{plan.tile_count} tiles"
+        st.caption(f"📦 Estimated size: ~{plan.tiled_bytes / 1e6:.1f} MB at {scale}m ({tiles})")
+    elif plan.fits:
+        st.caption(f"📦 Estimated size: ~{size_mb:.1f} MB at {scale}m")
+    else:
+        fitted_mb = estimate_download_bytes(bbox, plan.single_file_scale, bands, dtype) / 1e6
+        st.caption(
+            f"📦 ~{size_mb:.1f} MB at {scale}m exceeds the single-file limit; "
+            f"will export ~{fitted_mb:.1f} MB at {plan.single_file_scale}m"
+        )
+    
+    # Identical exports are served from the local raster cache
+    variant = 'tiled' if export_mode == "Full resolution (tiled)" else 'single'
+    cache = get_raster_cache()
+    cache_key = raster_cache_key(export_fp, result['aoi_fp'], scale, f"{variant}|{dtype}")
+    
+    jobs = get_download_jobs()
+    job = jobs.get(cache_key)
+    if job is not None and job.status == 'done' and cache.get(cache_key) is None:
+        # The finished file was evicted from the cache since; allow a new export
+        jobs.forget(cache_key)
+        job = None
+    
+    if cache.get(cache_key) is None and (job is None or job.status == 'failed'):
+        if job is not None:
+            st.error(f"❌ Download failed: {job.error}. Try a smaller area or coarser resolution.")
+        if st.button("Prepare Download", key="sat_download"):
+            # Runs on a background worker; the page stays usable meanwhile
+            name = os.path.splitext(file_name)[0]
+            job = jobs.submit(
+                cache_key, file_name,
+                lambda: _export_to_cache(
+                    cache_key, export_image, result['aoi'], bbox, scale, name,
+                    variant, bands, dtype, band_names
+                )
+            )
+    
+    if job is not None and job.active:
+        _render_download_job(cache_key)
+    else:
+        _render_cached_download(cache_key, scale, file_name)
+
+
+def _export_to_cache(cache_key, image, aoi, bbox, scale, name, variant,
+                     bands, dtype, band_names):
+    """Export a GeoTIFF into the raster cache (runs on a download job worker)."""
+    # Streamed to a spool file on disk; the export itself never holds the
+    # GeoTIFF in memory
+    path = new_download_path()
+    try:
+        if variant == 'tiled':
+            download_ee_image_tiled(image, bbox, scale, path, name, bands=bands,
+                                    dtype=dtype, band_names=band_names)
+            used_scale = scale
+        else:
+            used_scale = download_ee_image_file(image, aoi, scale, path, name, bbox=bbox,
+                                                bands=bands, dtype=dtype, band_names=band_names)
+            if used_scale is None:
+                raise RuntimeError("export did not fit the download limit, even at a coarser scale")
+    except Exception:
+        os.remove(path)
+        raise
+    
+    get_raster_cache().put(cache_key, path, used_scale)
+    return {'scale': used_scale}
+
+
+def _render_cached_download(cache_key, scale, file_name):
+    """
+    Offer a finished export from the raster cache.
+    
+    With the local proxy enabled the file is streamed from disk through a
+    download link. Otherwise st.download_button reads the whole file into
+    Streamlit's media store, which costs memory equal to the file size.
+    """
+    cached = get_raster_cache().get(cache_key)
+    if cached is None:
+        return
+    
+    if cached.scale != scale:
+        st.info(
+            f"ℹ️ Resolution automatically adjusted to {cached.scale}m "
+            f"to fit the download size limit."
+        )
+    
+    proxy = get_tile_proxy()
+    if proxy is not None:
+        st.link_button("📥 Download GeoTIFF", proxy.register_file(cached.path, file_name))
+        return
+    
+    try:
+        f = open(cached.path, 'rb')
+    except FileNotFoundError:
+        # Evicted by a concurrent export since the lookup
+        st.info("ℹ️ The prepared file was just removed from the cache. Please prepare it again.")
+        return
+    with f:
+        st.download_button(
+            "📥 Download GeoTIFF",
+            data=f,
+            file_name=file_name,
+            mime="image/tiff",
+            key="sat_download_btn"
+        )
+
+
+def _poll_download_job(cache_key):
+    """Show the status of a running export and rerun once it finishes."""
+    job = get_download_jobs().get(cache_key)
+    if job is None or not job.active:
+        st.rerun()
+    
+    elapsed = int(time.time() - job.created)
+    state = "Queued" if job.status == 'queued' else "Preparing"
+    st.info(f"⏳ {state} {job.label} in the background ({elapsed}s)... "
+            f"You can keep working meanwhile.")
+    if not DOWNLOAD_POLL_AUTOMATIC:
+        st.button("🔄 Refresh status", key="sat_download_refresh")
+
+
+# Poll running exports without rerunning the page where fragments exist;
+# older Streamlit versions fall back to a refresh button
+DOWNLOAD_POLL_SECONDS = 2
+if hasattr(st, 'fragment'):
+    DOWNLOAD_POLL_AUTOMATIC = True
+    _render_download_job = st.fragment(run_every=DOWNLOAD_POLL_SECONDS)(_poll_download_job)
+else:
+    DOWNLOAD_POLL_AUTOMATIC = False
+    _render_download_job = _poll_download_job
 
 
 # =============================================================================
@@ -443,6 +838,7 @@ def render_compare_images():
     st.markdown('<div class="step-header"><strong>Step 1:</strong> Select Area of Interest</div>', unsafe_allow_html=True)
     aoi_component = AOIComponent(session_prefix="cmp_")
     aoi = aoi_component.render()
+    aoi_info = aoi_component.get_aoi_info()
     
     if aoi is None:
         st.info("👆 Please select and confirm an area of interest to continue")
@@ -483,18 +879,47 @@ def render_compare_images():
     indices = list(get_available_indices().keys())
     selected_index = st.selectbox("Select Index:", indices, key="cmp_index")
     
+    # Change quantification
+    breaks = None
+    change_scale = None
+    if st.checkbox(
+        "📐 Quantify change area",
+        help="Classifies the difference map and reports the area of each class in hectares",
+        key="cmp_change_enable"
+    ):
+        col1, col2 = st.columns(2)
+        with col1:
+            no_change = st.slider("No-change band (±):", 0.01, 0.30, 0.05, 0.01, key="cmp_change_minor")
+        with col2:
+            strong = st.slider("Strong change from (±):", 0.05, 1.00, 0.20, 0.05, key="cmp_change_major")
+        if strong <= no_change:
+            strong = round(no_change + 0.05, 2)
+            st.warning(f"⚠️ Strong change must exceed the no-change band; using ±{strong:.2f}")
+        breaks = change_breaks(no_change, strong)
+        
+        # The coarser of the two sensors' adaptive scales
+        area_km2 = st.session_state.get('cmp_aoi_area_km2', 100)
+        change_scale = max(get_adaptive_scale_for_area(area_km2, s) for s in (sensor1, sensor2))
+    
     # Generate comparison
     if st.button("🗺️ Generate Comparison", type="primary", key="cmp_generate"):
         _generate_comparison(
             aoi, sensor1, sensor2, selected_index,
             str(date1_start), str(date1_end),
-            str(date2_start), str(date2_end)
+            str(date2_start), str(date2_end), aoi_info,
+            breaks=breaks, change_scale=change_scale
         )
 
 
 def _generate_comparison(aoi, sensor1, sensor2, index_name, 
-                         d1_start, d1_end, d2_start, d2_end):
-    """Generate comparison maps."""
+                         d1_start, d1_end, d2_start, d2_end, aoi_info=None,
+                         breaks=None, change_scale=None):
+    """
+    Generate comparison maps.
+    
+    With ``breaks``, the difference is also classified into change classes
+    and the area of each is computed at ``change_scale`` meters.
+    """
     
     with st.spinner("Generating comparison..."):
         try:
@@ -517,29 +942,57 @@ def _generate_comparison(aoi, sensor1, sensor2, index_name,
             else:
                 col2 = get_modis_collection(d2_start, d2_end, aoi)
             
-            # Check sizes
-            if col1.size().getInfo() == 0 or col2.size().getInfo() == 0:
-                st.error("❌ No images found for one or both date ranges.")
-                return
-            
-            # Create composites
+            # Composites, indices and vis params are all built client-side
             img1 = col1.median().clip(aoi)
             img2 = col2.median().clip(aoi)
             
             # Calculate indices
             idx1 = calculate_index(img1, index_name, sensor1)
             idx2 = calculate_index(img2, index_name, sensor2)
-            
-            # Get center
-            try:
-                centroid = aoi.centroid().getInfo()['coordinates']
-                center = [centroid[1], centroid[0]]
-            except Exception:
-                center = [39.0, -98.0]
+            diff = idx2.subtract(idx1).rename('Difference')
             
             # Vis params
             vmin, vmax, palette = get_index_vis_params(index_name)
             vis_params = {'bands': [index_name], 'min': vmin, 'max': vmax, 'palette': palette}
+            diff_vis = {
+                'bands': ['Difference'],
+                'min': -0.3, 'max': 0.3,
+                'palette': ['d73027', 'f46d43', 'fdae61', 'ffffbf', 'a6d96a', '66bd63', '1a9850']
+            }
+            
+            # Both image counts (plus the AOI outline and centroid when they
+            # aren't known client-side) in one bundle, requested alongside the
+            # three map layers. Registering the layers warms the tile URL
+            # cache, so the maps below render without further round trips.
+            metadata = {'count1': col1.size(), 'count2': col2.size()}
+            if aoi_info is None:
+                metadata['centroid'] = aoi.centroid().coordinates()
+                metadata['aoi'] = aoi
+            calls = {
+                'metadata': lambda: evaluate_bundle(metadata),
+                'image1': lambda: get_tile_url(idx1, vis_params),
+                'image2': lambda: get_tile_url(idx2, vis_params),
+                'diff': lambda: get_tile_url(diff, diff_vis),
+            }
+            if breaks:
+                # Per-class areas from one grouped reduction, in flight with the rest
+                calls['change'] = change_area_stats(diff, breaks, aoi, change_scale).getInfo
+            results = get_executor().run_all(calls, timeout=MAP_TIMEOUT_SECONDS)
+            # Layer failures are reported by the maps themselves
+            if not results['metadata'].ok:
+                raise results['metadata'].error
+            metadata = results['metadata'].value
+            
+            if metadata['count1'] == 0 or metadata['count2'] == 0:
+                st.error("❌ No images found for one or both date ranges.")
+                return
+            
+            # Get center
+            if aoi_info is not None:
+                aoi_geojson, centroid = aoi_info['geojson'], aoi_info['centroid']
+            else:
+                aoi_geojson, centroid = metadata['aoi'], metadata['centroid']
+            center = [centroid[1], centroid[0]] if centroid else [39.0, -98.0]
             
             st.markdown('<div class="step-header"><strong>Results</strong></div>', unsafe_allow_html=True)
             
@@ -552,7 +1005,7 @@ def _generate_comparison(aoi, sensor1, sensor2, index_name,
                     center=center, zoom=11,
                     ee_image=idx1, vis_params=vis_params,
                     layer_name=f"{index_name} - Image 1",
-                    aoi=aoi, height=350,
+                    aoi=aoi, aoi_geojson=aoi_geojson, height=350,
                     key="cmp_map1"
                 )
             
@@ -562,25 +1015,18 @@ def _generate_comparison(aoi, sensor1, sensor2, index_name,
                     center=center, zoom=11,
                     ee_image=idx2, vis_params=vis_params,
                     layer_name=f"{index_name} - Image 2",
-                    aoi=aoi, height=350,
+                    aoi=aoi, aoi_geojson=aoi_geojson, height=350,
                     key="cmp_map2"
                 )
             
             # Difference map
             st.markdown("### 📊 Difference Map (Image 2 - Image 1)")
             
-            diff = idx2.subtract(idx1).rename('Difference')
-            diff_vis = {
-                'bands': ['Difference'],
-                'min': -0.3, 'max': 0.3,
-                'palette': ['d73027', 'f46d43', 'fdae61', 'ffffbf', 'a6d96a', '66bd63', '1a9850']
-            }
-            
             display_ee_map(
                 center=center, zoom=11,
                 ee_image=diff, vis_params=diff_vis,
                 layer_name="Change",
-                aoi=aoi, height=400,
+                aoi=aoi, aoi_geojson=aoi_geojson, height=400,
                 key="cmp_diff"
             )
             
@@ -591,97 +1037,97 @@ def _generate_comparison(aoi, sensor1, sensor2, index_name,
             - 🔴 **Red**: Vegetation decreased
             """)
             
+            if breaks:
+                if results['change'].ok:
+                    _render_change_areas(parse_change_areas(results['change'].value, breaks),
+                                         change_scale)
+                else:
+                    st.warning(f"⚠️ Could not compute change areas: {str(results['change'].error)[:100]}")
+            
             st.success("✅ Comparison complete!")
             
         except Exception as e:
             st.error(f"❌ Error: {str(e)}")
 
 
+# Bar colors for the five default change classes, loss to gain
+CHANGE_CLASS_COLORS = ['#d73027', '#fdae61', '#ffffbf', '#a6d96a', '#1a9850']
+
+
+def _render_change_areas(rows, scale):
+    """Table and bar chart of the area in each change class."""
+    st.markdown("### 📐 Change Area")
+    
+    df = pd.DataFrame(rows)
+    colors = CHANGE_CLASS_COLORS if len(rows) == len(CHANGE_CLASS_COLORS) else None
+    fig = go.Figure(go.Bar(
+        x=df['label'],
+        y=df['area_ha'],
+        marker_color=colors,
+        marker_line_color='#666666',
+        marker_line_width=1,
+        hovertemplate='%{x}: %{y:,.1f} ha<extra></extra>'
+    ))
+    fig.update_layout(
+        yaxis_title="Area (ha)",
+        height=320,
+        margin=dict(l=10, r=10, t=10, b=10),
+        template='plotly_white'
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    
+    st.dataframe(
+        df[['label', 'area_ha', 'percent']].rename(columns={
+            'label': 'Change class', 'area_ha': 'Area (ha)', 'percent': 'Share (%)'
+        }).round({'Area (ha)': 1, 'Share (%)': 1}),
+        use_container_width=True,
+        hide_index=True
+    )
+    st.caption(f"Computed at {scale}m resolution over pixels valid in both images")
+
+
 # =============================================================================
 # Drone Image Analysis Page
 # =============================================================================
 
 # RGB-based vegetation indices (no NIR needed)
-RGB_INDICES = {
-    "ExG": "Excess Green - highlights vegetation",
-    "ExR": "Excess Red - highlights stressed vegetation",
-    "ExGR": "Excess Green minus Red - vegetation vs soil",
-    "GRVI": "Green-Red Vegetation Index",
-    "MGRVI": "Modified GRVI - enhanced contrast",
-    "RGBVI": "RGB Vegetation Index - normalized"
-}
+RGB_INDICES = {key: d.description for key, d in list_indices(family='rgb').items()}
 
 # Multispectral indices (requires NIR band)
 MULTISPECTRAL_INDICES = {
-    "NDVI": "Normalized Difference Vegetation Index",
-    "EVI": "Enhanced Vegetation Index",
-    "SAVI": "Soil Adjusted Vegetation Index",
-    "NDWI": "Normalized Difference Water Index",
-    "GNDVI": "Green NDVI",
+    key: d.name
+    for key, d in list_indices(family='multispectral',
+                               available_bands=('RED', 'GREEN', 'BLUE', 'NIR')).items()
 }
 
 
 def calculate_rgb_index(img_array, index_name):
     """Calculate RGB-based vegetation index."""
-    import numpy as np
+    if index_name not in RGB_INDICES:
+        index_name = "ExG"
     
-    r = img_array[:, :, 0].astype(np.float32) / 255.0
-    g = img_array[:, :, 1].astype(np.float32) / 255.0
-    b = img_array[:, :, 2].astype(np.float32) / 255.0
-    
-    eps = 1e-7
-    
-    if index_name == "ExG":
-        return 2 * g - r - b
-    elif index_name == "ExR":
-        return 1.4 * r - g
-    elif index_name == "ExGR":
-        exg = 2 * g - r - b
-        exr = 1.4 * r - g
-        return exg - exr
-    elif index_name == "GRVI":
-        return (g - r) / (g + r + eps)
-    elif index_name == "MGRVI":
-        g2, r2 = g ** 2, r ** 2
-        return (g2 - r2) / (g2 + r2 + eps)
-    elif index_name == "RGBVI":
-        g2, br = g ** 2, b * r
-        return (g2 - br) / (g2 + br + eps)
-    else:
-        return 2 * g - r - b
+    # Only the bands the formula reads, converted and scaled in one pass each
+    needed = get_index_definition(index_name).bands
+    bands = prepare_bands(img_array, {b: RGB_CHANNELS[b] for b in needed}, scale=1 / 255)
+    return evaluate_numpy(index_name, bands)
 
 
 def calculate_multispectral_index(img_array, index_name, band_mapping):
     """Calculate multispectral vegetation index."""
-    import numpy as np
-    
-    eps = 1e-7
-    
-    # Extract bands based on mapping
-    r = img_array[:, :, band_mapping['red']].astype(np.float32)
-    g = img_array[:, :, band_mapping['green']].astype(np.float32)
-    nir = img_array[:, :, band_mapping['nir']].astype(np.float32)
+    if index_name not in MULTISPECTRAL_INDICES:
+        index_name = "NDVI"
+    channels = {
+        'RED': band_mapping['red'],
+        'GREEN': band_mapping['green'],
+        'BLUE': band_mapping.get('blue', 2),
+        'NIR': band_mapping['nir'],
+    }
     
     # Normalize to 0-1 if 8-bit
-    if r.max() > 1:
-        r, g, nir = r / 255.0, g / 255.0, nir / 255.0
-    
-    if index_name == "NDVI":
-        return (nir - r) / (nir + r + eps)
-    elif index_name == "EVI":
-        b = img_array[:, :, band_mapping.get('blue', 2)].astype(np.float32)
-        if b.max() > 1:
-            b = b / 255.0
-        return 2.5 * (nir - r) / (nir + 6 * r - 7.5 * b + 1 + eps)
-    elif index_name == "SAVI":
-        L = 0.5
-        return (1 + L) * (nir - r) / (nir + r + L + eps)
-    elif index_name == "NDWI":
-        return (g - nir) / (g + nir + eps)
-    elif index_name == "GNDVI":
-        return (nir - g) / (nir + g + eps)
-    else:
-        return (nir - r) / (nir + r + eps)
+    scale = 1 / 255 if img_array[:, :, channels['RED']].max() > 1 else None
+    needed = get_index_definition(index_name).bands
+    bands = prepare_bands(img_array, {b: channels[b] for b in needed}, scale=scale)
+    return evaluate_numpy(index_name, bands)
 
 
 def create_colormap_image(data, colormap='RdYlGn'):